@@ -24,6 +24,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.metrics.RequestMetricsMiddleware',
+    'main.query_inspector.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,7 +39,9 @@ ROOT_URLCONF = 'disaster_prep.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render time counted in the request metrics
+        'BACKEND': 'main.metrics.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -67,6 +71,89 @@ if DATABASE_URL:
     import dj_database_url
     DATABASES['default'] = dj_database_url.parse(DATABASE_URL)
 
+# SQLite performance profile, enabled with SQLITE_PROFILE=performance.
+# WAL lets readers run alongside the single writer, IMMEDIATE transactions take
+# the write lock up front instead of failing mid-transaction with
+# "database is locked", and the busy timeout makes writers wait for the lock.
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'default')
+SQLITE_PERFORMANCE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 134217728,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PROFILE == 'performance' and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PERFORMANCE_PRAGMAS.items()),
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_PERFORMANCE_PRAGMAS['busy_timeout'] / 1000,
+    }
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Persistent connections; overrides the profile default when set
+if os.environ.get('CONN_MAX_AGE'):
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ['CONN_MAX_AGE'])
+
+# Cache
+# The curriculum cache is versioned and its version is bumped when an edit commits.
+# The default local-memory cache belongs to a single process, so bumps made by other
+# workers or by management commands never reach it; there entries and the version
+# expire after CURRICULUM_CACHE_TIMEOUT seconds instead. Use CACHE_BACKEND=file
+# whenever several processes serve or edit the curriculum: every process then sees
+# each bump and entries never need to expire.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'disaster-prep',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+CURRICULUM_CACHE_ALIAS = 'default'
+if os.environ.get('CURRICULUM_CACHE_TIMEOUT'):
+    CURRICULUM_CACHE_TIMEOUT = int(os.environ['CURRICULUM_CACHE_TIMEOUT'])
+else:
+    CURRICULUM_CACHE_TIMEOUT = None if CACHE_BACKEND == 'file' else 60
+
+# Rendered module bodies are cached by module id and updated_at (see main/fragments.py);
+# minifying collapses whitespace, compressing zlib-compresses the stored fragment
+MODULE_FRAGMENT_MINIFY = os.environ.get('MODULE_FRAGMENT_MINIFY', '1') == '1'
+MODULE_FRAGMENT_COMPRESS = os.environ.get('MODULE_FRAGMENT_COMPRESS', '0') == '1'
+
+# Quiz and drill attempt writes: 'sync' inserts each attempt immediately,
+# 'buffered' queues them and flushes with bulk_create in batches of
+# ATTEMPT_BUFFER_SIZE or every ATTEMPT_BUFFER_INTERVAL seconds (see main/write_buffer.py)
+ATTEMPT_WRITE_MODE = os.environ.get('ATTEMPT_WRITE_MODE', 'sync')
+ATTEMPT_BUFFER_SIZE = int(os.environ.get('ATTEMPT_BUFFER_SIZE', 100))
+ATTEMPT_BUFFER_INTERVAL = float(os.environ.get('ATTEMPT_BUFFER_INTERVAL', 2.0))
+
+# Per-request metrics (see main/metrics.py), exposed to staff at /metrics/.
+# REQUEST_METRICS_SERVER_TIMING adds a Server-Timing header to every response;
+# REQUEST_METRICS_RECENT is how many recent durations per view feed the quantiles
+REQUEST_METRICS_SERVER_TIMING = os.environ.get('REQUEST_METRICS_SERVER_TIMING', '0') == '1'
+REQUEST_METRICS_RECENT = int(os.environ.get('REQUEST_METRICS_RECENT', 500))
+
+# N+1 and slow query detection for development and staging (see main/query_inspector.py).
+# QUERY_INSPECTOR is 'off', 'log' or 'raise'; a SQL shape repeated QUERY_INSPECTOR_REPEATS
+# times in one request counts as N+1, a query over QUERY_INSPECTOR_SLOW_MS as slow
+QUERY_INSPECTOR = os.environ.get('QUERY_INSPECTOR', 'off')
+QUERY_INSPECTOR_REPEATS = int(os.environ.get('QUERY_INSPECTOR_REPEATS', 5))
+QUERY_INSPECTOR_SLOW_MS = float(os.environ.get('QUERY_INSPECTOR_SLOW_MS', 100))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -0,0 +1,77 @@
+"""
+Gunicorn settings for serving disaster_prep in production.
+
+Every setting can be overridden from the environment. Send the master
+SIGHUP to reload workers gracefully (new code and settings, no dropped
+requests) and SIGTERM to drain and stop.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# Pre-fork process model: one master, WEB_CONCURRENCY workers
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+
+# Curriculum edits reach other workers only through a shared cache. With a
+# local-memory cache per worker, the workers would serve different curriculum,
+# answer keys, page ETags and search results, so default to the file cache.
+if workers > 1 and os.environ.setdefault('CACHE_BACKEND', 'file') != 'file':
+    raise RuntimeError(
+        f"CACHE_BACKEND={os.environ['CACHE_BACKEND']} is local to each worker; "
+        f"use CACHE_BACKEND=file or WEB_CONCURRENCY=1"
+    )
+
+# Kill workers stuck on a request, and give in-flight requests time to finish on reload/stop
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically; jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Preloading shares memory between workers but SIGHUP then cannot pick up new code
+preload_app = os.environ.get('GUNICORN_PRELOAD', '') == '1'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Migrate and seed once in the master, before any worker starts"""
+    if os.environ.get('STARTUP_MODE') == 'skip':
+        return
+    import logging
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'disaster_prep.settings')
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    from main.startup import BootTimer, boot
+    timer = BootTimer()
+    with timer.phase('django.setup'):
+        django.setup()
+    boot(timer, full=os.environ.get('STARTUP_MODE') == 'full')
+
+
+def post_fork(server, worker):
+    """Workers must open their own database connections, never inherit the master's"""
+    from django.db import connections
+    connections.close_all()
+
+
+def worker_exit(server, worker):
+    """Write attempts still queued by ATTEMPT_WRITE_MODE=buffered before the worker goes away"""
+    from main.write_buffer import flush_attempts_in_thread
+    flush_attempts_in_thread(timeout=graceful_timeout)
+
+
+def worker_abort(worker):
+    """A worker aborted for exceeding the timeout skips atexit, so flush its queued attempts here"""
+    from main.write_buffer import flush_attempts_in_thread
+    # The master kills an aborted worker whose heartbeat is still stale; refresh it for the flush
+    worker.notify()
+    flush_attempts_in_thread(timeout=timeout / 2)
@@ -1,7 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from .admin_tools import HighVolumeAdmin, OrderedChildAdmin, OrderedInlineForm, OrderedParentAdmin
+from .curriculum_edits import set_contacts_active
 from .models import (
     DisasterType, EducationModule, Quiz, QuizQuestion, DrillChecklist, DrillStep,
-    UserProfile, ModuleProgress, QuizAttempt, DrillCompletion, EmergencyContact
+    UserProfile, ModuleProgress, QuizAttempt, DrillCompletion, EmergencyContact,
+    UserDisasterProgress, DisasterAnalytics
 )
 
 @admin.register(DisasterType)
@@ -23,34 +26,46 @@ class EducationModuleAdmin(admin.ModelAdmin):
 
 class QuizQuestionInline(admin.TabularInline):
     model = QuizQuestion
+    form = OrderedInlineForm
     extra = 1
     fields = ['question_text', 'correct_answer', 'order']
 
 @admin.register(Quiz)
-class QuizAdmin(admin.ModelAdmin):
+class QuizAdmin(OrderedParentAdmin, admin.ModelAdmin):
     list_display = ['title', 'disaster_type', 'created_at']
     list_filter = ['disaster_type', 'created_at']
     search_fields = ['title', 'description']
     inlines = [QuizQuestionInline]
 
 @admin.register(QuizQuestion)
-class QuizQuestionAdmin(admin.ModelAdmin):
+class QuizQuestionAdmin(OrderedChildAdmin, admin.ModelAdmin):
     list_display = ['quiz', 'question_text', 'correct_answer', 'order']
     list_filter = ['quiz__disaster_type', 'correct_answer']
+    list_select_related = ['quiz__disaster_type']
     search_fields = ['question_text']
+    parent_field = 'quiz'
 
 class DrillStepInline(admin.TabularInline):
     model = DrillStep
+    form = OrderedInlineForm
     extra = 1
     fields = ['step_text', 'order', 'is_critical', 'time_limit']
 
 @admin.register(DrillChecklist)
-class DrillChecklistAdmin(admin.ModelAdmin):
+class DrillChecklistAdmin(OrderedParentAdmin, admin.ModelAdmin):
     list_display = ['title', 'disaster_type', 'created_at']
     list_filter = ['disaster_type', 'created_at']
     search_fields = ['title', 'description']
     inlines = [DrillStepInline]
 
+@admin.register(DrillStep)
+class DrillStepAdmin(OrderedChildAdmin, admin.ModelAdmin):
+    list_display = ['drill_checklist', 'step_text', 'order', 'is_critical', 'time_limit']
+    list_filter = ['drill_checklist__disaster_type', 'is_critical']
+    list_select_related = ['drill_checklist__disaster_type']
+    search_fields = ['step_text']
+    parent_field = 'drill_checklist'
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'user_type', 'institution', 'grade_level', 'created_at']
@@ -58,27 +73,67 @@ class UserProfileAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__first_name', 'user__last_name', 'institution']
 
 @admin.register(ModuleProgress)
-class ModuleProgressAdmin(admin.ModelAdmin):
+class ModuleProgressAdmin(HighVolumeAdmin, admin.ModelAdmin):
     list_display = ['user', 'module', 'completed', 'completion_date', 'time_spent']
     list_filter = ['completed', 'module__disaster_type', 'completion_date']
+    list_select_related = ['user', 'module__disaster_type']
+    date_hierarchy = 'completion_date'
     search_fields = ['user__username', 'module__title']
+    search_item_field = 'module'
+    search_help_text = 'Username prefix or part of the module title'
 
 @admin.register(QuizAttempt)
-class QuizAttemptAdmin(admin.ModelAdmin):
+class QuizAttemptAdmin(HighVolumeAdmin, admin.ModelAdmin):
     list_display = ['user', 'quiz', 'score', 'correct_answers', 'total_questions', 'completed_at']
     list_filter = ['quiz__disaster_type', 'completed_at']
+    list_select_related = ['user', 'quiz__disaster_type']
+    date_hierarchy = 'completed_at'
+    ordering = ['-completed_at', '-id']
     search_fields = ['user__username', 'quiz__title']
+    search_item_field = 'quiz'
+    search_help_text = 'Username prefix or part of the quiz title'
     readonly_fields = ['completed_at']
 
 @admin.register(DrillCompletion)
-class DrillCompletionAdmin(admin.ModelAdmin):
+class DrillCompletionAdmin(HighVolumeAdmin, admin.ModelAdmin):
     list_display = ['user', 'drill_checklist', 'completion_percentage', 'completed_at']
     list_filter = ['drill_checklist__disaster_type', 'completed_at']
+    list_select_related = ['user', 'drill_checklist__disaster_type']
+    date_hierarchy = 'completed_at'
+    ordering = ['-completed_at', '-id']
     search_fields = ['user__username', 'drill_checklist__title']
+    search_item_field = 'drill_checklist'
+    search_help_text = 'Username prefix or part of the drill title'
     readonly_fields = ['completed_at']
 
+@admin.register(UserDisasterProgress)
+class UserDisasterProgressAdmin(HighVolumeAdmin, admin.ModelAdmin):
+    list_display = ['user', 'disaster_type', 'modules_completed', 'quiz_attempts', 'best_quiz_score', 'drill_completions', 'updated_at']
+    list_filter = ['disaster_type']
+    list_select_related = ['user', 'disaster_type']
+    search_fields = ['user__username']
+    readonly_fields = ['updated_at']
+
+@admin.register(DisasterAnalytics)
+class DisasterAnalyticsAdmin(admin.ModelAdmin):
+    list_display = ['disaster_type', 'institution', 'grade_level', 'modules_completed', 'quiz_attempts', 'drill_completions', 'updated_at']
+    list_filter = ['disaster_type', 'grade_level']
+    search_fields = ['institution']
+    readonly_fields = ['updated_at']
+
 @admin.register(EmergencyContact)
 class EmergencyContactAdmin(admin.ModelAdmin):
     list_display = ['name', 'organization', 'phone_number', 'contact_type', 'is_active']
     list_filter = ['contact_type', 'is_active', 'created_at']
     search_fields = ['name', 'organization', 'phone_number']
+    actions = ['activate', 'deactivate']
+    
+    @admin.action(description='Show selected contacts')
+    def activate(self, request, queryset):
+        changed = set_contacts_active(queryset, True)
+        self.message_user(request, f'Activated {changed} contacts.', messages.SUCCESS)
+    
+    @admin.action(description='Hide selected contacts')
+    def deactivate(self, request, queryset):
+        changed = set_contacts_active(queryset, False)
+        self.message_user(request, f'Deactivated {changed} contacts.', messages.SUCCESS)
@@ -0,0 +1,188 @@
+from collections import defaultdict
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.shortcuts import render
+from django.utils.functional import cached_property
+
+from .curriculum_edits import ORDERED_CHILDREN, clone_to_disaster_type, move_orders_aside, renumber_children
+from .models import DisasterType
+
+
+def estimated_table_rows(model):
+    """Rough row count of a whole table without scanning it"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    # Integer primary keys are handed out in order, so the highest one bounds
+    # the row count from above and is read straight off the primary key index.
+    return model.objects.aggregate(top=Max('pk'))['top'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs an unbounded COUNT(*).
+
+    Counting stops after ``count_cap`` rows. When an unfiltered changelist
+    reaches the cap the total is estimated from the table instead, so the
+    page links stay useful on tables with millions of rows.
+    """
+
+    count_cap = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        bounded = queryset.order_by()[:self.count_cap].count()
+        if bounded < self.count_cap:
+            return bounded
+        if not queryset.query.where:
+            return max(estimated_table_rows(queryset.model), bounded)
+        return bounded
+
+
+class HighVolumeAdmin:
+    """
+    Changelist defaults for the per-user history tables.
+
+    Related objects shown in the list are joined in, the paginator counts
+    at most ``EstimatedCountPaginator.count_cap`` rows and the extra
+    unfiltered COUNT(*) is skipped. Searching matches a username prefix,
+    ignoring case, or a curriculum title, and both are turned into ``IN``
+    lookups on indexed foreign keys instead of ``LIKE '%term%'`` over
+    joined tables.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Curriculum foreign key whose title is searched as well, e.g. 'quiz'
+    search_item_field = None
+    search_help_text = 'Username prefix'
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+
+        # A prefix LIKE is a seek on the case-insensitive username index (migration 0009)
+        users = User.objects.filter(username__istartswith=term)
+        condition = Q(user__in=users)
+        if self.search_item_field:
+            item_model = self.model._meta.get_field(self.search_item_field).related_model
+            # Curriculum tables are small, scanning their titles is cheap
+            condition |= Q(**{f'{self.search_item_field}__in': item_model.objects.filter(title__icontains=term)})
+        return queryset.filter(condition), False
+
+
+class DisasterTypeChoiceForm(forms.Form):
+    disaster_type = forms.ModelChoiceField(queryset=DisasterType.objects.order_by('name'))
+
+
+class OrderedInlineForm(forms.ModelForm):
+    """
+    Inline form for numbered children that leaves ``order`` uniqueness to the formset.
+
+    The formset already rejects two rows with the same order, and it holds
+    every sibling, so the per-row database check would only reject swaps.
+    """
+
+    def validate_unique(self):
+        exclude = self._get_validation_exclusions()
+        exclude.add('order')
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except ValidationError as e:
+            self._update_errors(e)
+
+
+class OrderedParentAdmin:
+    """
+    Quiz and drill checklist admin whose questions or steps are numbered.
+
+    Inline rows whose order changed are moved out of the way before the
+    formset saves them, so swapping two orders no longer trips
+    ``unique_together``. Bulk actions renumber children and clone parents
+    to another disaster type, each in one transaction.
+    """
+
+    actions = ['renumber_children', 'clone_to_disaster_type']
+
+    def save_formset(self, request, form, formset, change):
+        child_model, parent_field = ORDERED_CHILDREN[self.model]
+        if formset.model is child_model and change:
+            moved = [
+                inline.instance.pk for inline in formset.initial_forms
+                if 'order' in inline.changed_data or (formset.can_delete and inline.cleaned_data.get('DELETE'))
+            ]
+            if moved:
+                new_orders = [inline.cleaned_data.get('order') or 0 for inline in formset.forms if inline.cleaned_data]
+                move_orders_aside(child_model, parent_field, form.instance.pk, moved, headroom=max(new_orders, default=0))
+        super().save_formset(request, form, formset, change)
+
+    @admin.action(description='Renumber questions or steps 1, 2, 3… keeping their order')
+    def renumber_children(self, request, queryset):
+        child_model, parent_field = ORDERED_CHILDREN[self.model]
+        # One transaction for every selected parent, so a failure leaves none renumbered
+        with transaction.atomic():
+            total = sum(
+                renumber_children(child_model, parent_field, parent_id)
+                for parent_id in queryset.values_list('id', flat=True)
+            )
+        self.message_user(request, f'Renumbered {total} {child_model._meta.verbose_name_plural}.', messages.SUCCESS)
+
+    @admin.action(description='Clone to another disaster type')
+    def clone_to_disaster_type(self, request, queryset):
+        form = DisasterTypeChoiceForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            disaster_type = form.cleaned_data['disaster_type']
+            clones = clone_to_disaster_type(queryset.order_by('id'), disaster_type)
+            self.message_user(
+                request,
+                f'Cloned {len(clones)} {self.model._meta.verbose_name_plural} to {disaster_type.name}.',
+                messages.SUCCESS
+            )
+            return None
+        return render(request, 'admin/main/clone_to_disaster_type.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Clone to another disaster type',
+            'opts': self.model._meta,
+            'queryset': queryset,
+            'form': form,
+            'action': 'clone_to_disaster_type',
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+
+class OrderedChildAdmin:
+    """Question or step admin with actions that move rows to the top or bottom of their parent"""
+
+    actions = ['move_to_top', 'move_to_bottom']
+    # Foreign key to the parent the rows are numbered within
+    parent_field = None
+
+    def _move(self, request, queryset, where):
+        by_parent = defaultdict(list)
+        with transaction.atomic():
+            for pk, parent_id in queryset.values_list('pk', f'{self.parent_field}_id'):
+                by_parent[parent_id].append(pk)
+            for parent_id, pks in by_parent.items():
+                renumber_children(self.model, self.parent_field, parent_id, **{f'{where}_ids': pks})
+        moved = sum(len(pks) for pks in by_parent.values())
+        self.message_user(request, f'Moved {moved} {self.model._meta.verbose_name_plural}.', messages.SUCCESS)
+
+    @admin.action(description='Move to the top of their quiz or drill')
+    def move_to_top(self, request, queryset):
+        self._move(request, queryset, 'first')
+
+    @admin.action(description='Move to the bottom of their quiz or drill')
+    def move_to_bottom(self, request, queryset):
+        self._move(request, queryset, 'last')
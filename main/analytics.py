@@ -0,0 +1,196 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from . import curriculum
+from .models import (
+    UserProfile, ModuleProgress, QuizAttempt, DrillCompletion, DisasterAnalytics
+)
+
+SNAPSHOT_FIELDS = [
+    'modules_completed', 'quiz_attempts', 'quiz_score_sum', 'drill_completions', 'drill_score_sum',
+]
+
+
+def get_user_bucket(user):
+    """Return the (institution, grade_level) bucket a user's activity is counted under"""
+    bucket = UserProfile.objects.filter(user=user).values_list('institution', 'grade_level').first()
+    return bucket or ('', '')
+
+
+def record_activity(user, disaster_type_id, modules_completed=0, quiz_score=None, drill_score=None):
+    """Add one user's new activity to the analytics snapshot for their bucket"""
+    institution, grade_level = get_user_bucket(user)
+
+    changes = {}
+    if modules_completed:
+        changes['modules_completed'] = F('modules_completed') + modules_completed
+    if quiz_score is not None:
+        changes['quiz_attempts'] = F('quiz_attempts') + 1
+        changes['quiz_score_sum'] = F('quiz_score_sum') + quiz_score
+    if drill_score is not None:
+        changes['drill_completions'] = F('drill_completions') + 1
+        changes['drill_score_sum'] = F('drill_score_sum') + drill_score
+    if not changes:
+        return
+
+    lookup = {
+        'disaster_type_id': disaster_type_id,
+        'institution': institution,
+        'grade_level': grade_level,
+    }
+    with transaction.atomic():
+        DisasterAnalytics.objects.get_or_create(**lookup)
+        DisasterAnalytics.objects.filter(**lookup).update(**changes)
+
+
+def _user_count_rows(institution=None, grade_level=None):
+    profiles = UserProfile.objects.all()
+    if institution is not None:
+        profiles = profiles.filter(institution=institution)
+    if grade_level is not None:
+        profiles = profiles.filter(grade_level=grade_level)
+    return profiles.values('user_type').annotate(count=Count('id')).order_by()
+
+
+def _count_users(rows):
+    counts = {'total': 0, 'student': 0, 'teacher': 0, 'admin': 0}
+    for row in rows:
+        counts[row['user_type']] = row['count']
+        counts['total'] += row['count']
+    return counts
+
+
+def get_user_counts(institution=None, grade_level=None):
+    """Count profiles by user type, optionally restricted to an institution or grade"""
+    return _count_users(_user_count_rows(institution, grade_level))
+
+
+def _snapshot_rows(disaster_types=None, institution=None, grade_level=None):
+    snapshots = DisasterAnalytics.objects.all()
+    if disaster_types is not None:
+        snapshots = snapshots.filter(disaster_type__in=disaster_types)
+    if institution is not None:
+        snapshots = snapshots.filter(institution=institution)
+    if grade_level is not None:
+        snapshots = snapshots.filter(grade_level=grade_level)
+    return snapshots.values('disaster_type').annotate(
+        modules_completed_total=Sum('modules_completed'),
+        quiz_attempts_total=Sum('quiz_attempts'),
+        quiz_score_total=Sum('quiz_score_sum'),
+        drill_completions_total=Sum('drill_completions'),
+        drill_score_total=Sum('drill_score_sum'),
+    ).order_by()
+
+
+def _summarize_snapshots(disaster_types, rows, summaries, student_count):
+    totals = {row['disaster_type']: row for row in rows}
+
+    disaster_progress = []
+    for disaster_type in disaster_types:
+        row = totals.get(disaster_type.id, {})
+        total_modules = summaries.get(disaster_type.id, {}).get('module_count', 0)
+        modules_completed = row.get('modules_completed_total') or 0
+        quiz_attempts = row.get('quiz_attempts_total') or 0
+        drill_completions = row.get('drill_completions_total') or 0
+
+        disaster_progress.append({
+            'disaster_type': disaster_type,
+            'total_modules': total_modules,
+            'modules_completed': modules_completed,
+            'completion_rate': (modules_completed / (total_modules * student_count) * 100) if total_modules > 0 and student_count > 0 else 0,
+            'quiz_attempts': quiz_attempts,
+            'avg_quiz_score': (row['quiz_score_total'] / quiz_attempts) if quiz_attempts else 0,
+            'drill_completions': drill_completions,
+            'avg_drill_score': (row['drill_score_total'] / drill_completions) if drill_completions else 0,
+        })
+    return disaster_progress
+
+
+def get_disaster_analytics(disaster_types, student_count, institution=None, grade_level=None):
+    """
+    Summarize precomputed snapshots for each disaster type.
+
+    Runs one grouped query regardless of how much raw activity exists;
+    module totals come from the curriculum cache.
+    Returns a list of dicts in the order of ``disaster_types``.
+    """
+    rows = _snapshot_rows(disaster_types, institution, grade_level)
+    return _summarize_snapshots(disaster_types, rows, curriculum.get_disaster_summaries(), student_count)
+
+
+async def aget_analytics(institution=None, grade_level=None):
+    """
+    Async user counts and per-disaster analytics for every disaster type.
+
+    The cache lookups and the profile count and snapshot queries run one
+    after the other on the shared ORM thread, without blocking the event
+    loop. Returns ``(user_counts, disaster_progress)``.
+    """
+    disaster_types = await sync_to_async(curriculum.get_disaster_types)()
+    summaries = await sync_to_async(curriculum.get_disaster_summaries)()
+    count_rows = [row async for row in _user_count_rows(institution, grade_level)]
+    snapshot_rows = [row async for row in _snapshot_rows(institution=institution, grade_level=grade_level)]
+    user_counts = _count_users(count_rows)
+    return user_counts, _summarize_snapshots(disaster_types, snapshot_rows, summaries, user_counts['student'])
+
+
+def rebuild_analytics(disaster_type_ids=None, batch_size=1000):
+    """Replace the snapshots of all, or of the given, disaster types with values recomputed from history"""
+    institution = 'user__userprofile__institution'
+    grade_level = 'user__userprofile__grade_level'
+    snapshots = {}
+
+    def snapshot_for(disaster_type_id, row):
+        key = (disaster_type_id, row[institution] or '', row[grade_level] or '')
+        if key not in snapshots:
+            snapshots[key] = {field: 0 for field in SNAPSHOT_FIELDS}
+        return snapshots[key]
+
+    module_progress = ModuleProgress.objects.filter(completed=True)
+    quiz_attempts = QuizAttempt.objects.all()
+    drill_completions = DrillCompletion.objects.all()
+    existing = DisasterAnalytics.objects.all()
+    if disaster_type_ids is not None:
+        module_progress = module_progress.filter(module__disaster_type__in=disaster_type_ids)
+        quiz_attempts = quiz_attempts.filter(quiz__disaster_type__in=disaster_type_ids)
+        drill_completions = drill_completions.filter(drill_checklist__disaster_type__in=disaster_type_ids)
+        existing = existing.filter(disaster_type__in=disaster_type_ids)
+
+    module_rows = module_progress.values(
+        'module__disaster_type', institution, grade_level
+    ).annotate(completed=Count('id')).order_by()
+    for row in module_rows:
+        snapshot_for(row['module__disaster_type'], row)['modules_completed'] += row['completed']
+
+    quiz_rows = quiz_attempts.values(
+        'quiz__disaster_type', institution, grade_level
+    ).annotate(attempts=Count('id'), score_sum=Sum('score')).order_by()
+    for row in quiz_rows:
+        snapshot = snapshot_for(row['quiz__disaster_type'], row)
+        snapshot['quiz_attempts'] += row['attempts']
+        snapshot['quiz_score_sum'] += row['score_sum'] or 0
+
+    drill_rows = drill_completions.values(
+        'drill_checklist__disaster_type', institution, grade_level
+    ).annotate(completions=Count('id'), score_sum=Sum('completion_percentage')).order_by()
+    for row in drill_rows:
+        snapshot = snapshot_for(row['drill_checklist__disaster_type'], row)
+        snapshot['drill_completions'] += row['completions']
+        snapshot['drill_score_sum'] += row['score_sum'] or 0
+
+    with transaction.atomic():
+        existing.delete()
+        DisasterAnalytics.objects.bulk_create(
+            [
+                DisasterAnalytics(
+                    disaster_type_id=disaster_type_id,
+                    institution=institution_name,
+                    grade_level=grade,
+                    **values
+                )
+                for (disaster_type_id, institution_name, grade), values in snapshots.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(snapshots)
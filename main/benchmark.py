@@ -0,0 +1,67 @@
+import math
+import subprocess
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class EndpointStats:
+    """Latency, query count and status samples for one endpoint"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+
+    def record(self, seconds, queries, status_code):
+        self.latencies.append(seconds)
+        self.queries.append(queries)
+        if status_code >= 400:
+            self.errors += 1
+
+    def summary(self):
+        total = sum(self.latencies)
+        count = len(self.latencies)
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(self.latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(self.latencies, 99) * 1000, 3),
+            'mean_ms': round(total / count * 1000, 3) if count else 0,
+            'queries_per_request': round(sum(self.queries) / count, 2) if count else 0,
+            'max_queries': max(self.queries) if self.queries else 0,
+            'requests_per_second': round(count / total, 2) if total else 0,
+        }
+
+
+def timed_request(stats, send):
+    """Run ``send()`` and record its wall time, query count and status in ``stats``"""
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = send()
+        elapsed = time.perf_counter() - start
+    stats.record(elapsed, len(queries), response.status_code)
+    return response
+
+
+def git_revision():
+    """Current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
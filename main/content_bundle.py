@@ -0,0 +1,390 @@
+"""
+Versioned curriculum bundles.
+
+A bundle is either a JSON document::
+
+    {"format": "disaster-prep-curriculum", "version": 1,
+     "disaster_types": [...], "emergency_contacts": [...]}
+
+or, for large curricula, JSON Lines whose first line is the
+``{"format": ..., "version": ...}`` header and whose remaining lines are
+``{"disaster_type": {...}}`` or ``{"emergency_contact": {...}}`` records.
+Each disaster type record nests its ``modules``, ``quizzes`` (with
+``questions``) and ``drills`` (with ``steps``).
+
+Rows are matched on natural keys: disaster types by name, modules,
+questions and steps by order, quizzes and drills by title, and contacts by
+name and organization.
+"""
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import curriculum
+from .analytics import rebuild_analytics
+from .models import (
+    DisasterType, EducationModule, Quiz, QuizQuestion, DrillChecklist, DrillStep, EmergencyContact,
+    ModuleProgress, QuizAttempt, DrillCompletion
+)
+from .progress import rebuild_rollups
+
+BUNDLE_FORMAT = 'disaster-prep-curriculum'
+BUNDLE_VERSION = 1
+
+DISASTER_TYPE_FIELDS = ['description', 'icon']
+MODULE_FIELDS = ['title', 'content', 'estimated_read_time']
+QUIZ_FIELDS = ['description']
+QUESTION_FIELDS = [
+    'question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer', 'explanation'
+]
+DRILL_FIELDS = ['description']
+STEP_FIELDS = ['step_text', 'is_critical', 'time_limit']
+CONTACT_FIELDS = ['phone_number', 'email', 'contact_type', 'is_active']
+
+# Learner activity that cascades from pruned modules, quizzes and drills
+HISTORY_MODELS = {
+    ModuleProgress: 'module progress rows',
+    QuizAttempt: 'quiz attempts',
+    DrillCompletion: 'drill completions',
+}
+
+
+class BundleError(ValueError):
+    """Raised for malformed or unsupported bundles"""
+
+
+def _header():
+    return {'format': BUNDLE_FORMAT, 'version': BUNDLE_VERSION}
+
+
+def _check_header(header):
+    if not isinstance(header, dict) or header.get('format') != BUNDLE_FORMAT:
+        raise BundleError(f'Not a {BUNDLE_FORMAT} bundle')
+    if header.get('version') != BUNDLE_VERSION:
+        raise BundleError(f"Unsupported bundle version {header.get('version')!r}; expected {BUNDLE_VERSION}")
+
+
+def _values(obj, fields):
+    return {field: getattr(obj, field) for field in fields}
+
+
+def export_records():
+    """Yield bundle records for the whole curriculum, one disaster type at a time"""
+    for disaster_type in DisasterType.objects.order_by('name').iterator():
+        modules = EducationModule.objects.filter(disaster_type=disaster_type).order_by('order')
+        quizzes = Quiz.objects.filter(disaster_type=disaster_type).prefetch_related('questions').order_by('id')
+        drills = DrillChecklist.objects.filter(disaster_type=disaster_type).prefetch_related('steps').order_by('id')
+        yield {'disaster_type': {
+            'name': disaster_type.name,
+            **_values(disaster_type, DISASTER_TYPE_FIELDS),
+            'modules': [{'order': module.order, **_values(module, MODULE_FIELDS)} for module in modules],
+            'quizzes': [
+                {
+                    'title': quiz.title,
+                    **_values(quiz, QUIZ_FIELDS),
+                    'questions': [
+                        {'order': question.order, **_values(question, QUESTION_FIELDS)}
+                        for question in sorted(quiz.questions.all(), key=lambda question: question.order)
+                    ],
+                }
+                for quiz in quizzes
+            ],
+            'drills': [
+                {
+                    'title': drill.title,
+                    **_values(drill, DRILL_FIELDS),
+                    'steps': [
+                        {'order': step.order, **_values(step, STEP_FIELDS)}
+                        for step in sorted(drill.steps.all(), key=lambda step: step.order)
+                    ],
+                }
+                for drill in drills
+            ],
+        }}
+
+    for contact in EmergencyContact.objects.order_by('contact_type', 'name').iterator():
+        yield {'emergency_contact': {
+            'name': contact.name,
+            'organization': contact.organization,
+            **_values(contact, CONTACT_FIELDS),
+        }}
+
+
+def write_bundle(stream, jsonl=True):
+    """Write the curriculum to ``stream`` as JSON Lines (streamed) or one JSON document"""
+    if jsonl:
+        stream.write(json.dumps(_header()) + '\n')
+        for record in export_records():
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return
+
+    bundle = {**_header(), 'disaster_types': [], 'emergency_contacts': []}
+    for record in export_records():
+        if 'disaster_type' in record:
+            bundle['disaster_types'].append(record['disaster_type'])
+        else:
+            bundle['emergency_contacts'].append(record['emergency_contact'])
+    json.dump(bundle, stream, ensure_ascii=False, indent=2)
+    stream.write('\n')
+
+
+def read_bundle(stream, jsonl=True):
+    """Yield records from a bundle; JSON Lines input is parsed one line at a time"""
+    if not jsonl:
+        bundle = json.load(stream)
+        _check_header(bundle)
+        for disaster_type in bundle.get('disaster_types', []):
+            yield {'disaster_type': disaster_type}
+        for contact in bundle.get('emergency_contacts', []):
+            yield {'emergency_contact': contact}
+        return
+
+    lines = (line for line in stream if line.strip())
+    try:
+        _check_header(json.loads(next(lines)))
+    except StopIteration:
+        raise BundleError('Bundle is empty')
+    for number, line in enumerate(lines, start=2):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BundleError(f'Line {number}: {e}')
+        if 'disaster_type' not in record and 'emergency_contact' not in record:
+            raise BundleError(f'Line {number}: unknown record {sorted(record)}')
+        yield record
+
+
+class BundleImporter:
+    """
+    Apply bundle records to the database, writing only what changed.
+
+    Records are processed in batches; each batch loads the existing rows it
+    touches with one query per model and applies creates and updates with
+    ``bulk_create``/``bulk_update``. With ``prune`` set, children of an
+    imported disaster type, quiz or drill that are missing from the bundle
+    are deleted.
+
+    Quizzes and drills are matched by title, so renaming one in the bundle
+    prunes the old row along with its attempts or completions. Unless
+    ``delete_history`` is set, a prune that would delete learner history
+    raises BundleError and the import rolls back. Rows deleted by cascade
+    are counted in ``cascaded``, and rollups and analytics are rebuilt in
+    the import transaction after anything is pruned.
+    """
+
+    MODELS = [DisasterType, EducationModule, Quiz, QuizQuestion, DrillChecklist, DrillStep, EmergencyContact]
+
+    def __init__(self, prune=False, delete_history=False, batch_size=50):
+        self.prune = prune
+        self.delete_history = delete_history
+        self.batch_size = batch_size
+        self.stats = {
+            model._meta.model_name: {'created': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+            for model in self.MODELS
+        }
+        self.cascaded = {}
+
+    def run(self, records):
+        """Import every record in a single transaction; returns per-model stats"""
+        with transaction.atomic():
+            records = iter(records)
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                self.import_disaster_types([r['disaster_type'] for r in batch if 'disaster_type' in r])
+                self.import_contacts([r['emergency_contact'] for r in batch if 'emergency_contact' in r])
+            if any(counts['deleted'] for counts in self.stats.values()):
+                # Pruned rows take their cascaded history with them
+                rebuild_rollups()
+                rebuild_analytics()
+            # Bulk writes bypass the post_save signals that normally invalidate the cache
+            transaction.on_commit(curriculum.invalidate)
+        return self.stats
+
+    def _delete(self, model, pks):
+        """Delete rows and everything cascading from them, refusing to drop learner history unless allowed"""
+        _, deleted = model.objects.filter(pk__in=pks).delete()
+        names = {m._meta.label: m._meta.model_name for m in self.MODELS}
+        for label, count in deleted.items():
+            if label in names:
+                self.stats[names[label]]['deleted'] += count
+            else:
+                self.cascaded[label] = self.cascaded.get(label, 0) + count
+
+        history = [
+            f'{deleted[m._meta.label]} {name}' for m, name in HISTORY_MODELS.items() if deleted.get(m._meta.label)
+        ]
+        if history and not self.delete_history:
+            raise BundleError(
+                f"Pruning {model._meta.model_name} rows missing from the bundle would delete {', '.join(history)} "
+                f"(a renamed quiz or drill counts as missing); pass --delete-history to allow it"
+            )
+
+    def _fields(self, model, data, fields):
+        """Pick ``fields`` from bundle data, falling back to model defaults"""
+        values = {}
+        for field in fields:
+            if field in data:
+                values[field] = data[field]
+            else:
+                values[field] = model._meta.get_field(field).get_default()
+        return values
+
+    def _sync(self, model, existing, incoming, fields):
+        """
+        Create or update rows so that ``existing`` matches ``incoming``.
+
+        Both are dicts keyed by natural key; ``incoming`` values are field
+        dicts including foreign key ids. Returns the saved instances by key.
+        """
+        stats = self.stats[model._meta.model_name]
+        to_create, to_update, saved = [], [], {}
+        for key, values in incoming.items():
+            obj = existing.get(key)
+            if obj is None:
+                obj = model(**values)
+                to_create.append(obj)
+            elif any(getattr(obj, field) != values[field] for field in fields):
+                for field in fields:
+                    setattr(obj, field, values[field])
+                to_update.append(obj)
+            else:
+                stats['unchanged'] += 1
+            saved[key] = obj
+
+        if to_create:
+            model.objects.bulk_create(to_create, batch_size=500)
+            stats['created'] += len(to_create)
+        if to_update:
+            update_fields = list(fields)
+            if any(field.name == 'updated_at' for field in model._meta.fields):
+                # bulk_update skips auto_now, so stamp the change explicitly
+                now = timezone.now()
+                for obj in to_update:
+                    obj.updated_at = now
+                update_fields.append('updated_at')
+            model.objects.bulk_update(to_update, update_fields, batch_size=500)
+            stats['updated'] += len(to_update)
+
+        if self.prune:
+            stale = [obj.pk for key, obj in existing.items() if key not in incoming]
+            if stale:
+                self._delete(model, stale)
+        return saved
+
+    def import_disaster_types(self, records):
+        if not records:
+            return
+
+        existing = {obj.name: obj for obj in DisasterType.objects.filter(name__in=[r['name'] for r in records])}
+        disaster_types = self._sync(
+            DisasterType,
+            existing,
+            {r['name']: {'name': r['name'], **self._fields(DisasterType, r, DISASTER_TYPE_FIELDS)} for r in records},
+            DISASTER_TYPE_FIELDS,
+        )
+        # Only prune children of the disaster types in this batch, never other disaster types
+        ids = [obj.id for obj in disaster_types.values()]
+
+        incoming_modules, incoming_quizzes, incoming_drills = {}, {}, {}
+        for r in records:
+            disaster_type_id = disaster_types[r['name']].id
+            for m in r.get('modules', []):
+                incoming_modules[(disaster_type_id, m['order'])] = {
+                    'disaster_type_id': disaster_type_id, 'order': m['order'],
+                    **self._fields(EducationModule, m, MODULE_FIELDS),
+                }
+            for q in r.get('quizzes', []):
+                incoming_quizzes[(disaster_type_id, q['title'])] = (q, {
+                    'disaster_type_id': disaster_type_id, 'title': q['title'],
+                    **self._fields(Quiz, q, QUIZ_FIELDS),
+                })
+            for d in r.get('drills', []):
+                incoming_drills[(disaster_type_id, d['title'])] = (d, {
+                    'disaster_type_id': disaster_type_id, 'title': d['title'],
+                    **self._fields(DrillChecklist, d, DRILL_FIELDS),
+                })
+
+        self._sync(
+            EducationModule,
+            {(obj.disaster_type_id, obj.order): obj for obj in EducationModule.objects.filter(disaster_type__in=ids)},
+            incoming_modules,
+            MODULE_FIELDS,
+        )
+
+        quizzes = self._sync(
+            Quiz,
+            {(obj.disaster_type_id, obj.title): obj for obj in Quiz.objects.filter(disaster_type__in=ids)},
+            {key: values for key, (_, values) in incoming_quizzes.items()},
+            QUIZ_FIELDS,
+        )
+        incoming_questions = {}
+        for key, (data, _) in incoming_quizzes.items():
+            quiz_id = quizzes[key].id
+            for question in data.get('questions', []):
+                incoming_questions[(quiz_id, question['order'])] = {
+                    'quiz_id': quiz_id, 'order': question['order'],
+                    **self._fields(QuizQuestion, question, QUESTION_FIELDS),
+                }
+        self._sync(
+            QuizQuestion,
+            {
+                (obj.quiz_id, obj.order): obj
+                for obj in QuizQuestion.objects.filter(quiz__in=[quiz.id for quiz in quizzes.values()])
+            },
+            incoming_questions,
+            QUESTION_FIELDS,
+        )
+
+        drills = self._sync(
+            DrillChecklist,
+            {(obj.disaster_type_id, obj.title): obj for obj in DrillChecklist.objects.filter(disaster_type__in=ids)},
+            {key: values for key, (_, values) in incoming_drills.items()},
+            DRILL_FIELDS,
+        )
+        incoming_steps = {}
+        for key, (data, _) in incoming_drills.items():
+            drill_id = drills[key].id
+            for step in data.get('steps', []):
+                incoming_steps[(drill_id, step['order'])] = {
+                    'drill_checklist_id': drill_id, 'order': step['order'],
+                    **self._fields(DrillStep, step, STEP_FIELDS),
+                }
+        self._sync(
+            DrillStep,
+            {
+                (obj.drill_checklist_id, obj.order): obj
+                for obj in DrillStep.objects.filter(drill_checklist__in=[drill.id for drill in drills.values()])
+            },
+            incoming_steps,
+            STEP_FIELDS,
+        )
+
+    def import_contacts(self, records):
+        if not records:
+            return
+
+        # Contacts are never pruned per batch; they have no parent to scope deletion to
+        prune, self.prune = self.prune, False
+        try:
+            existing = {
+                (obj.name, obj.organization): obj
+                for obj in EmergencyContact.objects.filter(name__in={r['name'] for r in records})
+            }
+            self._sync(
+                EmergencyContact,
+                existing,
+                {
+                    (r['name'], r['organization']): {
+                        'name': r['name'], 'organization': r['organization'],
+                        **self._fields(EmergencyContact, r, CONTACT_FIELDS),
+                    }
+                    for r in records
+                },
+                CONTACT_FIELDS,
+            )
+        finally:
+            self.prune = prune
@@ -0,0 +1,231 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import (
+    DisasterType, EducationModule, Quiz, QuizQuestion, DrillChecklist, DrillStep, EmergencyContact
+)
+
+# Models whose changes invalidate every cached curriculum entry and page ETag
+CURRICULUM_MODELS = [DisasterType, EducationModule, Quiz, QuizQuestion, DrillChecklist, DrillStep, EmergencyContact]
+
+VERSION_KEY = 'curriculum:version'
+
+_MISSING = object()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def get_cache():
+    return caches[getattr(settings, 'CURRICULUM_CACHE_ALIAS', 'default')]
+
+
+def cache_timeout():
+    return getattr(settings, 'CURRICULUM_CACHE_TIMEOUT', None)
+
+
+def cache_is_process_local():
+    """Whether the curriculum cache lives in this process only, unseen by other workers and commands"""
+    return isinstance(get_cache(), LocMemCache)
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_version():
+    """Return the current curriculum version, seeding it if the cache was cleared"""
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a cleared or expired version never reuses stale keys
+        cache.add(VERSION_KEY, time.time_ns(), timeout=cache_timeout())
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """
+    Bump the curriculum version so every cached entry is ignored from now on.
+
+    Only processes sharing the cache see the bump. A process-local cache
+    expires its entries and the version itself after CURRICULUM_CACHE_TIMEOUT,
+    which bounds how long it serves curriculum changed elsewhere.
+    """
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=cache_timeout())
+    _count('invalidations')
+
+
+def get_cache_stats():
+    """Hit/miss counters for this process plus the active curriculum version"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0
+    stats['version'] = get_version()
+    return stats
+
+
+def cached(name, loader):
+    """Read-through lookup of a curriculum entry under the current version"""
+    cache = get_cache()
+    key = f'curriculum:{get_version()}:{name}'
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count('hits')
+        return value
+
+    _count('misses')
+    value = loader()
+    cache.set(key, value, timeout=cache_timeout())
+    return value
+
+
+def get_disaster_types():
+    return cached('disaster_types', lambda: list(DisasterType.objects.all()))
+
+
+def get_curriculum_totals():
+    """Total module and quiz counts across all disaster types"""
+    return cached('totals', lambda: {
+        'modules': EducationModule.objects.count(),
+        'quizzes': Quiz.objects.count(),
+    })
+
+
+def get_module(module_id):
+    return cached(
+        f'module:{module_id}',
+        lambda: EducationModule.objects.select_related('disaster_type').filter(id=module_id).first()
+    )
+
+
+def get_disaster_modules(disaster_type_id):
+    """Modules of a disaster type in reading order"""
+    return cached(
+        f'disaster:{disaster_type_id}:modules',
+        lambda: list(EducationModule.objects.filter(disaster_type_id=disaster_type_id).order_by('order'))
+    )
+
+
+def get_disaster_quiz(disaster_type_id):
+    return cached(
+        f'disaster:{disaster_type_id}:quiz',
+        lambda: Quiz.objects.filter(disaster_type_id=disaster_type_id).first()
+    )
+
+
+def get_quiz(quiz_id):
+    return cached(
+        f'quiz:{quiz_id}',
+        lambda: Quiz.objects.select_related('disaster_type').filter(id=quiz_id).first()
+    )
+
+
+def get_quiz_questions(quiz_id):
+    return cached(
+        f'quiz:{quiz_id}:questions',
+        lambda: list(QuizQuestion.objects.filter(quiz_id=quiz_id).order_by('order'))
+    )
+
+
+def get_drill(drill_id):
+    return cached(
+        f'drill:{drill_id}',
+        lambda: DrillChecklist.objects.select_related('disaster_type').filter(id=drill_id).first()
+    )
+
+
+def get_drill_steps(drill_id):
+    return cached(
+        f'drill:{drill_id}:steps',
+        lambda: list(DrillStep.objects.filter(drill_checklist_id=drill_id).order_by('order'))
+    )
+
+
+def _load_disaster_summaries():
+    summaries = {}
+
+    def summary_for(disaster_type_id):
+        if disaster_type_id not in summaries:
+            summaries[disaster_type_id] = {
+                'module_count': 0,
+                'quiz_count': 0,
+                'drill_count': 0,
+                'first_module_id': None,
+                'first_quiz_id': None,
+                'first_drill_id': None,
+            }
+        return summaries[disaster_type_id]
+
+    sources = [
+        (EducationModule.objects.order_by('disaster_type', 'order'), 'module'),
+        (Quiz.objects.order_by('disaster_type', 'id'), 'quiz'),
+        (DrillChecklist.objects.order_by('disaster_type', 'id'), 'drill'),
+    ]
+    for queryset, kind in sources:
+        for disaster_type_id, obj_id in queryset.values_list('disaster_type_id', 'id'):
+            summary = summary_for(disaster_type_id)
+            summary[f'{kind}_count'] += 1
+            if summary[f'first_{kind}_id'] is None:
+                summary[f'first_{kind}_id'] = obj_id
+    return summaries
+
+
+def get_disaster_summaries():
+    """
+    Per-disaster counts and first module/quiz/drill ids, keyed by disaster type id.
+
+    Built from three id-only queries over the whole curriculum, then cached.
+    """
+    return cached('disaster_summaries', _load_disaster_summaries)
+
+
+def _load_curriculum_outline():
+    outline = {}
+
+    def outline_for(disaster_type_id):
+        return outline.setdefault(disaster_type_id, {'modules': [], 'quizzes': []})
+
+    for disaster_type_id, module_id, title, order in EducationModule.objects.order_by(
+        'disaster_type', 'order'
+    ).values_list('disaster_type_id', 'id', 'title', 'order'):
+        outline_for(disaster_type_id)['modules'].append({'id': module_id, 'title': title, 'order': order})
+    for disaster_type_id, quiz_id, title in Quiz.objects.order_by('disaster_type', 'id').values_list(
+        'disaster_type_id', 'id', 'title'
+    ):
+        outline_for(disaster_type_id)['quizzes'].append({'id': quiz_id, 'title': title})
+    return outline
+
+
+def get_curriculum_outline():
+    """Module and quiz ids and titles per disaster type, keyed by disaster type id"""
+    return cached('outline', _load_curriculum_outline)
+
+
+def get_answer_key(quiz_id):
+    """
+    Compact answer key for a quiz, in question order.
+
+    ``question_ids`` and ``orders`` are tuples aligned with ``answers``, a
+    string holding one correct option letter per question.
+    """
+    def load():
+        rows = QuizQuestion.objects.filter(quiz_id=quiz_id).order_by('order').values_list(
+            'id', 'order', 'correct_answer'
+        )
+        question_ids, orders, answers = zip(*rows) if rows else ((), (), ())
+        return {
+            'question_ids': question_ids,
+            'orders': orders,
+            'answers': ''.join(answers),
+        }
+    return cached(f'quiz:{quiz_id}:answer_key', load)
@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models import F, Max
+
+from . import curriculum, search
+from .models import Quiz, QuizQuestion, DrillChecklist, DrillStep, EmergencyContact
+
+# Ordered children of each cloneable parent and the foreign key pointing at it
+ORDERED_CHILDREN = {
+    Quiz: (QuizQuestion, 'quiz'),
+    DrillChecklist: (DrillStep, 'drill_checklist'),
+}
+
+
+def _copy(obj, **overrides):
+    """Unsaved copy of a row without its primary key or creation timestamp"""
+    values = {
+        field.attname: getattr(obj, field.attname)
+        for field in obj._meta.concrete_fields
+        if not field.primary_key and not getattr(field, 'auto_now_add', False)
+    }
+    values.update(overrides)
+    return type(obj)(**values)
+
+
+def move_orders_aside(model, parent_field, parent_id, pks, headroom=0):
+    """
+    Shift the ``order`` of some rows past every order in use under the parent.
+
+    Rows with ``unique_together = [parent, 'order']`` cannot swap places one
+    save at a time; once moved aside they can be saved in any sequence.
+    ``headroom`` covers new orders that are about to be written.
+    """
+    siblings = model.objects.filter(**{parent_field: parent_id})
+    top = siblings.aggregate(top=Max('order'))['top'] or 0
+    # A single UPDATE adding more than the current maximum never lands on an
+    # order another row holds, whatever sequence the database applies it in
+    siblings.filter(pk__in=pks).update(order=F('order') + top + headroom + len(pks) + 1)
+
+
+def renumber_children(model, parent_field, parent_id, first_ids=(), last_ids=()):
+    """
+    Number a parent's children 1..n in one transaction.
+
+    Children in ``first_ids`` move to the top and those in ``last_ids`` to
+    the bottom, each group keeping its current relative order. Returns the
+    number of children renumbered.
+    """
+    with transaction.atomic():
+        children = list(model.objects.filter(**{parent_field: parent_id}).order_by('order', 'id'))
+        first, last = set(first_ids), set(last_ids) - set(first_ids)
+        sequence = (
+            [child for child in children if child.pk in first]
+            + [child for child in children if child.pk not in first and child.pk not in last]
+            + [child for child in children if child.pk in last]
+        )
+        move_orders_aside(model, parent_field, parent_id, [child.pk for child in children], headroom=len(children))
+        for position, child in enumerate(sequence, start=1):
+            child.order = position
+        model.objects.bulk_update(sequence, ['order'])
+        # Bulk writes skip the signals that normally drop the curriculum cache
+        transaction.on_commit(curriculum.invalidate)
+    return len(sequence)
+
+
+def clone_to_disaster_type(parents, disaster_type):
+    """
+    Copy quizzes or drill checklists, with their questions or steps, to another disaster type.
+
+    Everything is written with two bulk inserts inside one transaction.
+    Returns the new parent rows.
+    """
+    parents = list(parents)
+    if not parents:
+        return []
+    child_model, parent_field = ORDERED_CHILDREN[type(parents[0])]
+
+    with transaction.atomic():
+        clones = type(parents[0]).objects.bulk_create([
+            _copy(parent, disaster_type_id=disaster_type.pk) for parent in parents
+        ])
+        clone_ids = {parent.pk: clone.pk for parent, clone in zip(parents, clones)}
+        children = child_model.objects.filter(**{f'{parent_field}__in': clone_ids}).order_by('order')
+        child_model.objects.bulk_create([
+            _copy(child, **{f'{parent_field}_id': clone_ids[getattr(child, f'{parent_field}_id')]})
+            for child in children.iterator(chunk_size=500)
+        ], batch_size=500)
+
+        def refresh():
+            curriculum.invalidate()
+            for clone in clones:
+                search.reindex_children(clone)
+        transaction.on_commit(refresh)
+    return clones
+
+
+def set_contacts_active(queryset, active):
+    """Show or hide emergency contacts with one UPDATE; returns the number changed"""
+    with transaction.atomic():
+        ids = list(queryset.exclude(is_active=active).values_list('id', flat=True))
+        EmergencyContact.objects.filter(id__in=ids).update(is_active=active)
+
+        def refresh():
+            curriculum.invalidate()
+            for contact in EmergencyContact.objects.filter(id__in=ids):
+                search.index_instance(contact)
+        transaction.on_commit(refresh)
+    return len(ids)
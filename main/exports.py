@@ -0,0 +1,159 @@
+import csv
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.text import compress_sequence
+
+from .models import ModuleProgress, QuizAttempt, DrillCompletion
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# Rows fetched per database round trip while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+# Encoded rows are gathered into pieces of about this size before being sent
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+USER_COLUMNS = [
+    ('username', 'user__username'),
+    ('institution', 'user__userprofile__institution'),
+    ('grade_level', 'user__userprofile__grade_level'),
+]
+
+
+class ExportSpec:
+    """Columns and filters of one exportable history table"""
+
+    def __init__(self, model, timestamp, columns, base_filter=None):
+        self.model = model
+        self.timestamp = timestamp
+        self.columns = [('id', 'id'), *USER_COLUMNS, *columns, (timestamp, timestamp)]
+        self.base_filter = base_filter or {}
+
+    @property
+    def headers(self):
+        return [name for name, _ in self.columns]
+
+
+EXPORT_KINDS = {
+    'quizzes': ExportSpec(QuizAttempt, 'completed_at', [
+        ('disaster_type', 'quiz__disaster_type__name'),
+        ('quiz', 'quiz__title'),
+        ('score', 'score'),
+        ('correct_answers', 'correct_answers'),
+        ('total_questions', 'total_questions'),
+        ('time_taken', 'time_taken'),
+    ]),
+    'drills': ExportSpec(DrillCompletion, 'completed_at', [
+        ('disaster_type', 'drill_checklist__disaster_type__name'),
+        ('drill', 'drill_checklist__title'),
+        ('completion_percentage', 'completion_percentage'),
+        ('completed_steps', 'completed_steps'),
+        ('total_steps', 'total_steps'),
+        ('time_taken', 'time_taken'),
+    ]),
+    'modules': ExportSpec(ModuleProgress, 'completion_date', [
+        ('disaster_type', 'module__disaster_type__name'),
+        ('module', 'module__title'),
+        ('time_spent', 'time_spent'),
+    ], base_filter={'completed': True}),
+}
+
+
+def day_bounds(since=None, until=None):
+    """Turn inclusive dates into an aware [start, end) range in the current time zone"""
+    start = end = None
+    if since is not None:
+        start = timezone.make_aware(datetime.combine(since, time.min))
+    if until is not None:
+        end = timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min))
+    return start, end
+
+
+def export_rows(kind, institution=None, grade_level=None, since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Iterate over export rows as tuples in the order of ``EXPORT_KINDS[kind].headers``.
+
+    ``since`` and ``until`` are inclusive dates. Rows come from a server-side
+    iterator in ``chunk_size`` batches and never become model instances, so
+    memory stays flat however many rows match.
+    """
+    spec = EXPORT_KINDS[kind]
+    rows = spec.model.objects.filter(**spec.base_filter)
+    if institution is not None:
+        rows = rows.filter(user__userprofile__institution=institution)
+    if grade_level is not None:
+        rows = rows.filter(user__userprofile__grade_level=grade_level)
+    start, end = day_bounds(since, until)
+    if start is not None:
+        rows = rows.filter(**{f'{spec.timestamp}__gte': start})
+    if end is not None:
+        rows = rows.filter(**{f'{spec.timestamp}__lt': end})
+    lookups = [lookup for _, lookup in spec.columns]
+    return rows.order_by('id').values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object whose write returns the text, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def _encode_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _encode_jsonl(headers, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(headers, row))) + '\n'
+
+
+def _buffered(lines, size=EXPORT_BUFFER_BYTES):
+    """Join encoded lines into bytes chunks so each write to the client carries many rows"""
+    buffer, buffered = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= size:
+            yield b''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def stream_export(kind, rows, fmt='csv', compress=False):
+    """Bytes chunks of the encoded export, gzipped on the fly when ``compress`` is set"""
+    headers = EXPORT_KINDS[kind].headers
+    encode = _encode_csv if fmt == 'csv' else _encode_jsonl
+    chunks = _buffered(encode(headers, rows))
+    return compress_sequence(chunks) if compress else chunks
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iterator over export chunks, for responses served over ASGI.
+
+    Given a sync iterator, Django's ASGI handler reads the whole body into a
+    list before sending any of it. Here each chunk is produced on the sync
+    thread that owns the export's database cursor, one at a time.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def export_filename(kind, fmt='csv', compress=False):
+    stamp = timezone.localdate().isoformat()
+    return f"{kind}-{stamp}.{fmt}{'.gz' if compress else ''}"
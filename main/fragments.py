@@ -0,0 +1,75 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import curriculum
+from .http_caching import templates_fingerprint
+from .models import EducationModule
+
+FRAGMENT_TEMPLATE = 'module_content.html'
+
+_WHITESPACE = re.compile(r'\s+')
+# Whitespace is significant inside these elements
+_PRESERVE = re.compile(r'<(pre|textarea|script|style)\b', re.IGNORECASE)
+
+
+def fragment_key(module):
+    """
+    Cache key for a module's rendered body.
+
+    Any edit bumps updated_at and a deploy that changes the templates changes
+    their fingerprint, so either gives a new key; the file cache never expires
+    entries on its own.
+    """
+    return f'module-fragment:{templates_fingerprint()}:{module.id}:{module.updated_at.timestamp():.6f}'
+
+
+def minify_html(html):
+    """Collapse whitespace runs to one space, leaving markup with significant whitespace alone"""
+    if _PRESERVE.search(html):
+        return html
+    return _WHITESPACE.sub(' ', html).strip()
+
+
+def _render(module):
+    html = render_to_string(FRAGMENT_TEMPLATE, {'module': module})
+    if getattr(settings, 'MODULE_FRAGMENT_MINIFY', True):
+        html = minify_html(html)
+    return html
+
+
+def _store(module, html):
+    value = zlib.compress(html.encode()) if getattr(settings, 'MODULE_FRAGMENT_COMPRESS', False) else html
+    curriculum.get_cache().set(fragment_key(module), value, curriculum.cache_timeout())
+
+
+def render_module_content(module):
+    """
+    Rendered HTML of a module's content section.
+
+    Served from the cache when the module has not changed since it was last
+    rendered; otherwise rendered, optionally minified and compressed, and stored.
+    """
+    value = curriculum.get_cache().get(fragment_key(module))
+    if value is None:
+        html = _render(module)
+        _store(module, html)
+    elif isinstance(value, bytes):
+        html = zlib.decompress(value).decode()
+    else:
+        html = value
+    return mark_safe(html)
+
+
+def warm_module_fragments(modules=None):
+    """Render and cache the content of ``modules`` (default: every module); returns the count"""
+    if modules is None:
+        modules = EducationModule.objects.all().iterator()
+    count = 0
+    for module in modules:
+        _store(module, _render(module))
+        count += 1
+    return count
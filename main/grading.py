@@ -0,0 +1,78 @@
+import csv
+
+from . import curriculum
+
+
+def grade_answers(answer_key, answers):
+    """
+    Score one submission against an answer key in a single pass.
+
+    ``answers`` is a sequence of option letters (or None for unanswered)
+    aligned with the key's questions. Returns the score, counts and a
+    per-question list of booleans.
+    """
+    results = [
+        bool(given) and given.upper() == correct
+        for given, correct in zip(answers, answer_key['answers'])
+    ]
+    results += [False] * (len(answer_key['answers']) - len(results))
+
+    total_questions = len(results)
+    correct_answers = sum(results)
+    return {
+        'score': (correct_answers / total_questions * 100) if total_questions > 0 else 0,
+        'correct_answers': correct_answers,
+        'total_questions': total_questions,
+        'results': results,
+    }
+
+
+def answers_from_post(answer_key, data):
+    """Pick ``question_<id>`` fields out of submitted form data in key order"""
+    return [data.get(f'question_{question_id}') for question_id in answer_key['question_ids']]
+
+
+def grade_submission(quiz_id, data):
+    """Grade a submitted quiz form using the cached answer key"""
+    answer_key = curriculum.get_answer_key(quiz_id)
+    return grade_answers(answer_key, answers_from_post(answer_key, data))
+
+
+def grade_many(quiz_id, submissions):
+    """
+    Grade many submissions for one quiz against a single answer key lookup.
+
+    ``submissions`` is an iterable of answer sequences aligned with the
+    quiz's question order. Yields one result dict per submission.
+    """
+    answer_key = curriculum.get_answer_key(quiz_id)
+    for answers in submissions:
+        yield grade_answers(answer_key, answers)
+
+
+def grade_csv(quiz_id, csv_file, id_column='username'):
+    """
+    Grade paper answer sheets from a CSV file.
+
+    The CSV needs an ``id_column`` identifying the student and one column per
+    question, headed by the question's order number (``1``, ``2``...) or its
+    form field name (``question_<id>``). Yields ``(student, result)`` pairs.
+    """
+    answer_key = curriculum.get_answer_key(quiz_id)
+    reader = csv.DictReader(csv_file)
+    header = reader.fieldnames or []
+    if id_column not in header:
+        raise ValueError(f'CSV is missing the "{id_column}" column')
+
+    columns = []
+    for question_id, order in zip(answer_key['question_ids'], answer_key['orders']):
+        for name in (str(order), f'question_{question_id}'):
+            if name in header:
+                columns.append(name)
+                break
+        else:
+            columns.append(None)
+
+    for row in reader:
+        answers = [(row[name] or '').strip() if name else None for name in columns]
+        yield row[id_column], grade_answers(answer_key, answers)
@@ -0,0 +1,147 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.urls import reverse
+
+from . import curriculum
+from .models import ModuleProgress, QuizAttempt, DrillCompletion
+
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+
+class HistorySource:
+    """How one history table is filtered and ordered for keyset paging"""
+
+    def __init__(self, model, timestamp, item_field, base_filter=None):
+        self.model = model
+        self.timestamp = timestamp
+        self.item_field = item_field
+        self.base_filter = base_filter or {}
+
+    def queryset(self, user, item_id=None):
+        # Ordered on (timestamp, id) so ties between rows written in the same
+        # instant still page deterministically; the matching indexes end in -id.
+        filters = {'user': user, **self.base_filter}
+        if item_id is not None:
+            filters[f'{self.item_field}_id'] = item_id
+        return self.model.objects.filter(**filters).order_by(f'-{self.timestamp}', '-id')
+
+    def after(self, queryset, timestamp, pk):
+        """Rows strictly older than the cursor row, in a form SQLite can seek on"""
+        return queryset.filter(
+            Q(**{f'{self.timestamp}__lte': timestamp})
+            & (Q(**{f'{self.timestamp}__lt': timestamp}) | Q(id__lt=pk))
+        )
+
+
+HISTORY_SOURCES = {
+    'quizzes': HistorySource(QuizAttempt, 'completed_at', 'quiz'),
+    'drills': HistorySource(DrillCompletion, 'completed_at', 'drill_checklist'),
+    'modules': HistorySource(
+        ModuleProgress, 'completion_date', 'module',
+        base_filter={'completed': True, 'completion_date__isnull': False}
+    ),
+}
+
+
+def encode_cursor(timestamp, pk):
+    return base64.urlsafe_b64encode(f'{timestamp.isoformat()}|{pk}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) from a cursor; raises ValueError on anything malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError('Invalid cursor.') from e
+
+
+def _split_page(source, rows, limit):
+    # One extra row was fetched to tell whether there is an older page without a COUNT
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, source.timestamp), last.pk)
+    return rows, next_cursor
+
+
+def _prepare(kind, user, item_id, cursor, limit):
+    source = HISTORY_SOURCES[kind]
+    queryset = source.queryset(user, item_id)
+    if cursor:
+        queryset = source.after(queryset, *decode_cursor(cursor))
+    return source, queryset, max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+
+
+def get_history_page(kind, user, item_id=None, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of a user's quiz attempts, drill completions or completed modules.
+
+    Returns ``(rows, next_cursor)``, newest first; ``next_cursor`` is None on
+    the last page. Paging seeks on ``(timestamp, id)`` rather than using an
+    OFFSET, so a deep page costs the same as the first one.
+    """
+    source, queryset, limit = _prepare(kind, user, item_id, cursor, limit)
+    return _split_page(source, list(queryset[:limit + 1]), limit)
+
+
+async def aget_history_page(kind, user, item_id=None, cursor=None, limit=HISTORY_PAGE_SIZE):
+    source, queryset, limit = _prepare(kind, user, item_id, cursor, limit)
+    return _split_page(source, [row async for row in queryset[:limit + 1]], limit)
+
+
+def attach_history_items(kind, rows):
+    """Set ``row.item`` to the cached quiz, drill or module instead of joining it in"""
+    loader = {
+        'quizzes': curriculum.get_quiz,
+        'drills': curriculum.get_drill,
+        'modules': curriculum.get_module,
+    }[kind]
+    item_field = HISTORY_SOURCES[kind].item_field
+    items = {}
+    for row in rows:
+        item_id = getattr(row, f'{item_field}_id')
+        if item_id not in items:
+            items[item_id] = loader(item_id)
+        row.item = items[item_id]
+    return rows
+
+
+def serialize_history_row(kind, row):
+    item = row.item
+    data = {
+        'id': row.id,
+        'item_id': item.id if item else None,
+        'title': item.title if item else None,
+        'disaster_type': item.disaster_type.name if item else None,
+    }
+    if kind == 'quizzes':
+        data.update({
+            'completed_at': row.completed_at.isoformat(),
+            'score': row.score,
+            'correct_answers': row.correct_answers,
+            'total_questions': row.total_questions,
+            'time_taken': row.time_taken,
+            'url': reverse('quiz_detail', args=[row.quiz_id]),
+        })
+    elif kind == 'drills':
+        data.update({
+            'completed_at': row.completed_at.isoformat(),
+            'completion_percentage': row.completion_percentage,
+            'completed_steps': row.completed_steps,
+            'total_steps': row.total_steps,
+            'time_taken': row.time_taken,
+            'url': reverse('drill_checklist', args=[row.drill_checklist_id]),
+        })
+    else:
+        data.update({
+            'completed_at': row.completion_date.isoformat(),
+            'time_spent': row.time_spent,
+            'url': reverse('module_detail', args=[row.module_id]),
+        })
+    return data
@@ -0,0 +1,93 @@
+import hashlib
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.template import engines
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import curriculum
+from .progress import get_progress_stamp
+
+
+def _scan_templates():
+    parts = []
+    for directory in engines['django'].engine.dirs:
+        for path in sorted(Path(directory).rglob('*.html')):
+            stat = path.stat()
+            parts.append(f'{path.relative_to(directory)}:{stat.st_mtime_ns}:{stat.st_size}')
+    return hashlib.md5('\n'.join(parts).encode()).hexdigest()
+
+
+_cached_templates_fingerprint = lru_cache(maxsize=1)(_scan_templates)
+
+
+def templates_fingerprint():
+    """Fingerprint of the project templates, so a deploy that changes markup changes every ETag"""
+    if settings.DEBUG:
+        return _scan_templates()
+    return _cached_templates_fingerprint()
+
+
+def user_parts(request, progress=True):
+    """
+    Everything user-specific that a page template renders.
+
+    Covers the navigation (name and role), the CSRF token embedded in forms
+    and, unless ``progress`` is False, a stamp of the user's recorded progress.
+    """
+    user = request.user
+    profile = getattr(user, 'userprofile', None)
+    stamp = get_progress_stamp(user) if progress else {'rows': None, 'events': None, 'latest': None}
+    return {
+        'user': (user.pk, user.username, user.first_name, profile.user_type if profile else None),
+        'progress': (stamp['rows'], stamp['events']),
+        'progress_updated_at': stamp['latest'],
+        'csrf': request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    }
+
+
+def conditional_page(validators, **cache_control):
+    """
+    Conditional GET for a rendered page.
+
+    ``validators(request, *args, **kwargs)`` returns ``(parts, last_modified)``
+    or None when the resource does not exist; ``parts`` is hashed together
+    with the curriculum version and the template fingerprint into the ETag.
+    ``last_modified`` must move whenever anything in the ETag does, so pages
+    without such a timestamp return None and are validated by ETag alone.
+    Matching If-None-Match/If-Modified-Since requests get a 304 without the
+    view running. ``cache_control`` is applied to 200 and 304 responses.
+    Requests carrying flash messages always render and are never stored.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            if len(get_messages(request)):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_store=True)
+                return response
+
+            validated = validators(request, *args, **kwargs)
+            if validated is None:
+                return view(request, *args, **kwargs)
+            parts, last_modified = validated
+            fingerprint = repr((templates_fingerprint(), curriculum.get_version(), view.__name__, parts))
+            etag = f'"{hashlib.md5(fingerprint.encode()).hexdigest()}"'
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                if timestamp:
+                    response.headers.setdefault('Last-Modified', http_date(timestamp))
+                patch_cache_control(response, **cache_control)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,159 @@
+import json
+import platform
+import random
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from main import curriculum
+from main.analytics import rebuild_analytics
+from main.benchmark import EndpointStats, timed_request, git_revision
+from main.models import DisasterType
+from main.synthetic import generate_users
+from main.write_buffer import flush_attempts
+
+JOURNEY_STEPS = [
+    'register', 'dashboard', 'module_detail', 'complete_module',
+    'quiz_detail', 'submit_quiz', 'drill_checklist', 'complete_drill',
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic users and drive the main user journey, reporting latency and queries per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Background users to seed with history')
+        parser.add_argument('--journeys', type=int, default=50, help='Users driven through the full journey')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument(
+            '--fast-passwords',
+            action='store_true',
+            help='Use a fast password hasher so register measures the app rather than PBKDF2'
+        )
+        parser.add_argument(
+            '--commit',
+            action='store_true',
+            help='Keep the seeded data instead of rolling it back'
+        )
+
+    def handle(self, *args, **options):
+        if not DisasterType.objects.exists():
+            raise CommandError('No curriculum found; run populate_data first')
+
+        self.random = random.Random(options['seed'])
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher'] if options['fast_passwords'] else settings.PASSWORD_HASHERS
+
+        report = None
+        try:
+            with transaction.atomic(), override_settings(PASSWORD_HASHERS=hashers):
+                seed_seconds = self.seed(options['users'], options['seed'])
+                stats, wall_seconds = self.drive(options['journeys'])
+                flush_attempts()
+                report = self.build_report(options, stats, seed_seconds, wall_seconds)
+                if not options['commit']:
+                    raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            curriculum.invalidate()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            for name, summary in report['endpoints'].items():
+                self.stdout.write(
+                    f"{name:<16} p50 {summary['p50_ms']:>8.2f}ms  p95 {summary['p95_ms']:>8.2f}ms  "
+                    f"p99 {summary['p99_ms']:>8.2f}ms  {summary['queries_per_request']:>6.2f} q/req  "
+                    f"{summary['requests_per_second']:>8.1f} req/s"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def seed(self, user_count, seed):
+        """Bulk-create background users with module, quiz and drill history"""
+        start = time.perf_counter()
+        generate_users(0, user_count, f'bench-{int(time.time())}', seed)
+        rebuild_analytics()
+        return time.perf_counter() - start
+
+    def drive(self, journeys):
+        """Run each journey user through register, learn, quiz and drill"""
+        stats = {step: EndpointStats(step) for step in JOURNEY_STEPS}
+        disaster_types = list(DisasterType.objects.all())
+        prefix = f'journey-{int(time.time())}'
+
+        start = time.perf_counter()
+        for i in range(journeys):
+            client = Client()
+            disaster_type = self.random.choice(disaster_types)
+            module = disaster_type.modules.order_by('order').first()
+            quiz = disaster_type.quizzes.first()
+            drill = disaster_type.drill_checklists.first()
+            password = 'Prepared-Benchmark-42'
+
+            timed_request(stats['register'], lambda: client.post(reverse('register'), {
+                'username': f'{prefix}-{i}',
+                'password1': password,
+                'password2': password,
+                'user_type': 'student',
+                'institution': f'School {i % 10}',
+                'grade_level': str(6 + i % 7),
+            }))
+            timed_request(stats['dashboard'], lambda: client.get(reverse('dashboard')))
+
+            if module:
+                timed_request(stats['module_detail'], lambda: client.get(reverse('module_detail', args=[module.id])))
+                timed_request(stats['complete_module'], lambda: client.post(
+                    reverse('complete_module', args=[module.id]), {'time_spent': self.random.randint(60, 900)}
+                ))
+            if quiz:
+                answer_key = curriculum.get_answer_key(quiz.id)
+                timed_request(stats['quiz_detail'], lambda: client.get(reverse('quiz_detail', args=[quiz.id])))
+                answers = {
+                    f'question_{question_id}': self.random.choice('ABCD')
+                    for question_id in answer_key['question_ids']
+                }
+                answers['time_taken'] = self.random.randint(30, 600)
+                timed_request(stats['submit_quiz'], lambda: client.post(reverse('submit_quiz', args=[quiz.id]), answers))
+            if drill:
+                steps = curriculum.get_drill_steps(drill.id)
+                timed_request(stats['drill_checklist'], lambda: client.get(reverse('drill_checklist', args=[drill.id])))
+                checked = {f'step_{step.id}': 'on' for step in steps if self.random.random() < 0.8}
+                checked['time_taken'] = self.random.randint(30, 600)
+                timed_request(stats['complete_drill'], lambda: client.post(reverse('complete_drill', args=[drill.id]), checked))
+        return stats, time.perf_counter() - start
+
+    def build_report(self, options, stats, seed_seconds, wall_seconds):
+        total_requests = sum(len(endpoint.latencies) for endpoint in stats.values())
+        return {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'users': options['users'],
+                'journeys': options['journeys'],
+                'fast_passwords': options['fast_passwords'],
+                'seed_seconds': round(seed_seconds, 3),
+            },
+            'totals': {
+                'requests': total_requests,
+                'wall_seconds': round(wall_seconds, 3),
+                'requests_per_second': round(total_requests / wall_seconds, 2) if wall_seconds else 0,
+            },
+            'endpoints': {name: endpoint.summary() for name, endpoint in stats.items()},
+        }
@@ -0,0 +1,208 @@
+import http.client
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import django
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from main.benchmark import EndpointStats, git_revision
+from main.models import DisasterType, EducationModule
+
+SERVERS = ['runserver', 'wsgi', 'asgi']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Compare HTTP throughput of runserver against the gunicorn WSGI and ASGI entry points'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--servers',
+            default=','.join(SERVERS),
+            help=f"Comma-separated servers to run (default: {','.join(SERVERS)})"
+        )
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client connections')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per server')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Gunicorn worker processes')
+        parser.add_argument('--threads', type=int, default=1, help='Threads per WSGI worker')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        servers = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f"Unknown servers: {', '.join(sorted(unknown))}")
+        if not DisasterType.objects.exists():
+            raise CommandError('No curriculum found; run populate_data first')
+
+        user, session_key = self.create_session()
+        try:
+            paths = self.paths()
+            results = {}
+            for name in servers:
+                self.stderr.write(f'Benchmarking {name}...')
+                results[name] = self.run_server(name, paths, session_key, options)
+        finally:
+            SessionStore(session_key=session_key).delete()
+            user.delete()
+
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'cpus': os.cpu_count(),
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'workers': options['workers'],
+                'threads': options['threads'],
+                'paths': paths,
+            },
+            'servers': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            for name, result in results.items():
+                self.stdout.write(
+                    f"{name:<10} {result['requests_per_second']:>8.1f} req/s  p50 {result['p50_ms']:>8.2f}ms  "
+                    f"p99 {result['p99_ms']:>8.2f}ms  {result['errors']} errors"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def create_session(self):
+        """A throwaway user with a logged-in session the load clients can share"""
+        user = User.objects.create_user(f'server-bench-{int(time.time())}', password=None)
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return user, session.session_key
+
+    def paths(self):
+        disaster_type = DisasterType.objects.order_by('id').first()
+        module = EducationModule.objects.filter(disaster_type=disaster_type).order_by('order').first()
+        paths = [reverse('dashboard'), reverse('emergency_contacts'), reverse('get_progress', args=[disaster_type.id])]
+        if module:
+            paths.append(reverse('module_detail', args=[module.id]))
+        return paths
+
+    def command(self, name, port, options):
+        if name == 'runserver':
+            return [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+        command = [
+            sys.executable, 'serve.py',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(options['workers']),
+        ]
+        if name == 'asgi':
+            command.append('--asgi')
+        elif options['threads'] > 1:
+            command += ['--threads', str(options['threads'])]
+        return command
+
+    def run_server(self, name, paths, session_key, options):
+        port = free_port()
+        env = {**os.environ, 'STARTUP_MODE': 'skip', 'GUNICORN_ACCESS_LOG': '', 'GUNICORN_MAX_REQUESTS': '0'}
+        process = subprocess.Popen(
+            self.command(name, port, options),
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_until_ready(process, port)
+            return self.load(port, paths, session_key, options['concurrency'], options['duration'])
+        finally:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def wait_until_ready(self, process, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'Server exited with status {process.returncode}')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/')
+                connection.getresponse().read()
+                connection.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Server did not start within {timeout}s')
+
+    def load(self, port, paths, session_key, concurrency, duration):
+        """Drive ``concurrency`` keep-alive clients over ``paths`` for ``duration`` seconds"""
+        headers = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={session_key}'}
+        per_thread = [EndpointStats('all') for _ in range(concurrency)]
+        statuses = [Counter() for _ in range(concurrency)]
+
+        def client(stats, seen):
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            i = 0
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    connection.request('GET', paths[i % len(paths)], headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    status = 599
+                stats.record(time.perf_counter() - start, 0, status)
+                seen[status] += 1
+                i += 1
+            connection.close()
+
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(stats, seen)) for stats, seen in zip(per_thread, statuses)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        combined = EndpointStats('all')
+        for stats in per_thread:
+            combined.latencies += stats.latencies
+            combined.errors += stats.errors
+        summary = combined.summary()
+        return {
+            'requests': summary['requests'],
+            'errors': summary['errors'],
+            'p50_ms': summary['p50_ms'],
+            'p95_ms': summary['p95_ms'],
+            'p99_ms': summary['p99_ms'],
+            'mean_ms': summary['mean_ms'],
+            'requests_per_second': round(summary['requests'] / wall, 2) if wall else 0,
+            'statuses': {str(status): count for status, count in sorted(sum(statuses, Counter()).items())},
+        }
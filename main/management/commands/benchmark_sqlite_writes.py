@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Measure concurrent SQLite write throughput with the default and performance profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--writes', type=int, default=200, help='Submissions per thread')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        results = [
+            self.run_profile(name, options['threads'], options['writes'])
+            for name in ('default', 'performance')
+        ]
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for result in results:
+            self.stdout.write(
+                f"{result['profile']:<12} {result['writes_per_second']:>10.1f} writes/s  "
+                f"{result['locked_errors']:>5} locked errors  {result['seconds']:.2f}s"
+            )
+
+    def connect(self, path, profile):
+        if profile == 'performance':
+            pragmas = settings.SQLITE_PERFORMANCE_PRAGMAS
+            conn = sqlite3.connect(path, timeout=pragmas['busy_timeout'] / 1000, isolation_level=None)
+            for name, value in pragmas.items():
+                conn.execute(f'PRAGMA {name}={value}')
+        else:
+            # Django's stock sqlite3 settings: default timeout, deferred transactions
+            conn = sqlite3.connect(path, isolation_level=None)
+        return conn
+
+    def run_profile(self, profile, threads, writes):
+        """Simulate quiz submissions: read the rollup row, insert an attempt, update the rollup"""
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        begin = 'BEGIN IMMEDIATE' if profile == 'performance' else 'BEGIN'
+        try:
+            setup = self.connect(path, profile)
+            setup.execute(
+                'CREATE TABLE attempt (id INTEGER PRIMARY KEY, user_id INTEGER, quiz_id INTEGER, '
+                'score REAL, completed_at REAL)'
+            )
+            setup.execute('CREATE TABLE rollup (user_id INTEGER PRIMARY KEY, attempts INTEGER, score_sum REAL)')
+            setup.executemany('INSERT INTO rollup VALUES (?, 0, 0)', [(i,) for i in range(threads)])
+            setup.close()
+
+            counts = {'written': 0, 'locked': 0}
+            lock = threading.Lock()
+
+            def writer(user_id):
+                conn = self.connect(path, profile)
+                for i in range(writes):
+                    try:
+                        conn.execute(begin)
+                        conn.execute('SELECT attempts FROM rollup WHERE user_id = ?', (user_id,)).fetchone()
+                        conn.execute(
+                            'INSERT INTO attempt (user_id, quiz_id, score, completed_at) VALUES (?, ?, ?, ?)',
+                            (user_id, 1, i % 100, time.time())
+                        )
+                        conn.execute(
+                            'UPDATE rollup SET attempts = attempts + 1, score_sum = score_sum + ? WHERE user_id = ?',
+                            (i % 100, user_id)
+                        )
+                        conn.execute('COMMIT')
+                        with lock:
+                            counts['written'] += 1
+                    except sqlite3.OperationalError as e:
+                        if conn.in_transaction:
+                            conn.execute('ROLLBACK')
+                        if 'locked' not in str(e):
+                            raise
+                        with lock:
+                            counts['locked'] += 1
+                conn.close()
+
+            workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+        return {
+            'profile': profile,
+            'threads': threads,
+            'attempted': threads * writes,
+            'written': counts['written'],
+            'locked_errors': counts['locked'],
+            'seconds': round(elapsed, 3),
+            'writes_per_second': counts['written'] / elapsed if elapsed else 0,
+        }
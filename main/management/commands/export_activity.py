@@ -0,0 +1,52 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORT_KINDS, export_rows, stream_export
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}; expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Stream quiz attempts, drill completions or completed modules to CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORT_KINDS))
+        parser.add_argument('path', nargs='?', help='Output file, gzipped when it ends in .gz (default: stdout)')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--institution', help='Only users of this institution')
+        parser.add_argument('--grade-level', help='Only users of this grade')
+        parser.add_argument('--since', type=_date, help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--until', type=_date, help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Rows fetched per database round trip'
+        )
+
+    def handle(self, *args, **options):
+        rows = export_rows(
+            options['kind'], options['institution'], options['grade_level'],
+            options['since'], options['until'], chunk_size=options['chunk_size']
+        )
+        path = options['path']
+        compress = bool(path) and path.endswith('.gz')
+        chunks = stream_export(options['kind'], rows, options['format'], compress)
+
+        if not path:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
+            return
+
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Exported {options['kind']} to {path}"))
@@ -0,0 +1,26 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from main.content_bundle import write_bundle
+
+
+class Command(BaseCommand):
+    help = 'Export the curriculum and emergency contacts as a versioned content bundle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Output file (default: stdout)')
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Write a single JSON document instead of JSON Lines'
+        )
+
+    def handle(self, *args, **options):
+        if not options['path']:
+            write_bundle(sys.stdout, jsonl=not options['json'])
+            return
+
+        with open(options['path'], 'w', encoding='utf-8') as f:
+            write_bundle(f, jsonl=not options['json'])
+        self.stderr.write(self.style.SUCCESS(f"Exported content bundle to {options['path']}"))
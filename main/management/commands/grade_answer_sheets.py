@@ -0,0 +1,44 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import curriculum
+from main.grading import grade_csv
+
+
+class Command(BaseCommand):
+    help = 'Grade a CSV of paper answer sheets for a quiz and print per-question correctness'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int, help='Quiz to grade against')
+        parser.add_argument('csv_path', help='CSV with one row per student')
+        parser.add_argument(
+            '--id-column',
+            default='username',
+            help='Column identifying the student (default: username)'
+        )
+
+    def handle(self, *args, **options):
+        answer_key = curriculum.get_answer_key(options['quiz_id'])
+        if not answer_key['question_ids']:
+            raise CommandError(f'Quiz {options["quiz_id"]} has no questions')
+
+        writer = csv.writer(self.stdout)
+        writer.writerow(
+            [options['id_column'], 'score', 'correct_answers', 'total_questions']
+            + [f'q{order}' for order in answer_key['orders']]
+        )
+
+        graded = 0
+        with open(options['csv_path'], newline='') as csv_file:
+            try:
+                for student, result in grade_csv(options['quiz_id'], csv_file, options['id_column']):
+                    writer.writerow(
+                        [student, f"{result['score']:.1f}", result['correct_answers'], result['total_questions']]
+                        + [int(correct) for correct in result['results']]
+                    )
+                    graded += 1
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        self.stderr.write(self.style.SUCCESS(f'Graded {graded} answer sheets'))
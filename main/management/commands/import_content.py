@@ -0,0 +1,96 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main import curriculum
+from main.content_bundle import BundleError, BundleImporter, read_bundle
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Import a content bundle, creating or updating only the rows that changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Bundle file (.jsonl for JSON Lines, anything else is read as JSON)')
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete modules, quizzes, questions, drills and steps of imported disaster types missing from the bundle'
+        )
+        parser.add_argument(
+            '--delete-history',
+            action='store_true',
+            help='Let --prune delete modules, quizzes and drills that learners have progress, attempts or '
+                 'completions for; quizzes and drills are matched by title, so a rename prunes the old one'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change and roll back'
+        )
+        parser.add_argument(
+            '--no-warm',
+            action='store_true',
+            help='Skip pre-rendering module fragments after the import'
+        )
+        parser.add_argument(
+            '--local-cache',
+            action='store_true',
+            help='Import even though the cache is local to this process; running servers then serve '
+                 'the old curriculum until their entries expire after CURRICULUM_CACHE_TIMEOUT'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Bundle records diffed per batch'
+        )
+
+    def handle(self, *args, **options):
+        # The import bumps the curriculum version in this process's cache; servers only see it in a shared one
+        local_cache = curriculum.cache_is_process_local()
+        if local_cache and not options['dry_run'] and not options['local_cache']:
+            raise CommandError(
+                'The cache is local to this process, so running servers would not see the import; '
+                'run with the CACHE_BACKEND the servers use (CACHE_BACKEND=file) or pass --local-cache'
+            )
+
+        importer = BundleImporter(
+            prune=options['prune'], delete_history=options['delete_history'], batch_size=options['batch_size']
+        )
+        jsonl = options['path'].endswith('.jsonl')
+
+        try:
+            with open(options['path'], encoding='utf-8') as f, transaction.atomic():
+                stats = importer.run(read_bundle(f, jsonl=jsonl))
+                if options['dry_run']:
+                    raise Rollback()
+        except Rollback:
+            stats = importer.stats
+        except (OSError, BundleError) as e:
+            raise CommandError(str(e))
+
+        for model_name, counts in stats.items():
+            self.stdout.write(
+                f"{model_name:<16} {counts['created']:>6} created  {counts['updated']:>6} updated  "
+                f"{counts['unchanged']:>6} unchanged  {counts['deleted']:>6} deleted"
+            )
+        for label, count in importer.cascaded.items():
+            self.stdout.write(self.style.WARNING(f'{label:<16} {count:>6} deleted by cascade'))
+        if any(counts['deleted'] for counts in stats.values()):
+            verb = 'would be' if options['dry_run'] else 'were'
+            self.stdout.write(self.style.WARNING(
+                f'Rows {verb} pruned; progress rollups and analytics {verb} rebuilt in the same transaction'
+            ))
+        if not options['dry_run']:
+            # Bulk writes skip the signals that keep the search index current
+            call_command('rebuild_search_index', stdout=self.stdout)
+        if not options['dry_run'] and not options['no_warm'] and not local_cache:
+            changed = stats['educationmodule']['created'] + stats['educationmodule']['updated']
+            if changed:
+                call_command('warm_module_fragments', stdout=self.stdout)
+        verb = 'Checked' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {options['path']}"))
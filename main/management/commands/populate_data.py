@@ -1,4 +1,8 @@
+import time
+
 from django.core.management.base import BaseCommand
+from main.analytics import rebuild_analytics
+from main.synthetic import generate
 from main.models import (
     DisasterType, EducationModule, Quiz, QuizQuestion, 
     DrillChecklist, DrillStep, EmergencyContact
@@ -7,6 +11,24 @@ from main.models import (
 class Command(BaseCommand):
     help = 'Populate database with initial disaster preparedness data'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=int,
+            default=0,
+            help='Also generate this many synthetic users with module, quiz and drill history'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users per bulk insert transaction')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating chunks in parallel')
+        parser.add_argument('--institutions', type=int, default=50, help='Number of synthetic institutions')
+        parser.add_argument('--days', type=int, default=180, help='Spread synthetic activity over this many days')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for synthetic data')
+        parser.add_argument(
+            '--prefix',
+            default=None,
+            help='Username prefix for synthetic users (default: synthetic-<timestamp>)'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Populating database with initial data...')
         
@@ -54,6 +76,42 @@ class Command(BaseCommand):
         self.create_emergency_contacts()
         
         self.stdout.write(self.style.SUCCESS('Successfully populated database with initial data'))
+        
+        if options.get('scale'):
+            self.generate_synthetic_data(options)
+    
+    def generate_synthetic_data(self, options):
+        prefix = options['prefix'] or f'synthetic-{int(time.time())}'
+        self.stdout.write(
+            f"Generating {options['scale']} synthetic users as {prefix}-N "
+            f"with {options['workers']} worker(s)..."
+        )
+        
+        start = time.perf_counter()
+        done = {'users': 0}
+        
+        def report(counts):
+            done['users'] += counts['users']
+            self.stdout.write(f"  {done['users']}/{options['scale']} users")
+        
+        totals = generate(
+            options['scale'],
+            prefix,
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            institutions=options['institutions'],
+            days=options['days'],
+            progress=report,
+        )
+        rebuild_analytics()
+        
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {totals['users']} users, {totals['module_progress']} module completions, "
+            f"{totals['quiz_attempts']} quiz attempts and {totals['drill_completions']} drill completions "
+            f"in {elapsed:.1f}s"
+        ))
     
     def create_earthquake_modules(self, earthquake):
         modules = [
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main.analytics import rebuild_analytics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DisasterAnalytics snapshots from module, quiz and drill history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk insert'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_analytics(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} analytics snapshots'))
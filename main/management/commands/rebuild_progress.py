@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.progress import rebuild_rollups, find_rollup_mismatches
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the UserDisasterProgress rollup from history, or check it for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only compare stored rollups against history and report mismatches'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Limit to the given user id (may be repeated)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk insert when rebuilding'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+
+        if options['check']:
+            mismatches = find_rollup_mismatches(user_ids)
+            for user_id, disaster_type_id, field, stored, expected in mismatches:
+                self.stdout.write(
+                    f'user={user_id} disaster_type={disaster_type_id} {field}: '
+                    f'stored={stored} expected={expected}'
+                )
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} rollup mismatches found')
+            self.stdout.write(self.style.SUCCESS('Progress rollups are consistent'))
+            return
+
+        count = rebuild_rollups(user_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} progress rollups'))
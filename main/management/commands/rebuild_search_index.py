@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from main import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index over modules, quiz questions, drill steps and contacts'
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index()
+        backend = search.get_backend().name
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} documents ({backend} backend)'))
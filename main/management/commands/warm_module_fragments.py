@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main import curriculum
+from main.fragments import warm_module_fragments
+from main.models import EducationModule
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the content of education modules into the fragment cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--disaster-type',
+            type=int,
+            help='Only warm modules of this disaster type'
+        )
+
+    def handle(self, *args, **options):
+        if curriculum.cache_is_process_local():
+            raise CommandError(
+                'The cache is local to this process, so no server would read the warmed fragments; '
+                'run with the CACHE_BACKEND the servers use (CACHE_BACKEND=file)'
+            )
+        modules = EducationModule.objects.all()
+        if options['disaster_type']:
+            modules = modules.filter(disaster_type_id=options['disaster_type'])
+        count = warm_module_fragments(modules.iterator())
+        self.stdout.write(self.style.SUCCESS(f'Warmed {count} module fragments'))
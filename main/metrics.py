@@ -0,0 +1,272 @@
+"""
+Per-request performance metrics.
+
+``RequestMetricsMiddleware`` measures wall time, database queries and time,
+template render time and response size of every request, and adds them to
+an in-process registry keyed by view name. ``/metrics/`` renders the
+registry in the Prometheus text format. Each worker process keeps its own
+registry, so scrape every worker or run a single one when comparing numbers.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from collections import Counter, deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+# Upper bounds of the histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+RECENT_QUANTILES = (0.5, 0.95, 0.99)
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Counters for the request being served, shared with the threads it hands work to"""
+
+    __slots__ = ('queries', 'db_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+def install_execute_wrapper(wrapper):
+    """
+    Add ``wrapper`` to every database connection, open or opened later.
+
+    Connections are per thread, so besides ``connection_created`` this also
+    runs on ``request_started``, which fires in the thread that serves the
+    request, including the sync thread behind an ASGI worker.
+    """
+    def install(connection):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    def on_connection_created(connection, **kwargs):
+        install(connection)
+
+    def on_request_started(**kwargs):
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    uid = f'{wrapper.__module__}.{wrapper.__qualname__}'
+    connection_created.connect(on_connection_created, weak=False, dispatch_uid=f'{uid}:created')
+    request_started.connect(on_request_started, weak=False, dispatch_uid=f'{uid}:request')
+    on_request_started()
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time added to the current request's stats"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class ViewMetrics:
+    """Cumulative histograms and totals of one view, plus its most recent durations"""
+
+    def __init__(self, recent):
+        self.requests = 0
+        self.statuses = Counter()
+        self.duration_counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.duration_sum = 0.0
+        self.query_counts = [0] * (len(QUERY_BUCKETS) + 1)
+        self.query_sum = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.response_bytes = 0
+        self.recent = deque(maxlen=recent)
+
+    def observe(self, status, duration, stats, size):
+        self.requests += 1
+        self.statuses[f'{status // 100}xx'] += 1
+        self.duration_counts[bisect.bisect_left(DURATION_BUCKETS, duration)] += 1
+        self.duration_sum += duration
+        self.query_counts[bisect.bisect_left(QUERY_BUCKETS, stats.queries)] += 1
+        self.query_sum += stats.queries
+        self.db_seconds += stats.db_seconds
+        self.template_seconds += stats.template_seconds
+        self.response_bytes += size
+        self.recent.append(duration)
+
+
+def _label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe per-view metrics for this process"""
+
+    prefix = 'disaster_prep'
+
+    def __init__(self, recent=500):
+        self.recent = recent
+        self.views = {}
+        self.lock = threading.Lock()
+
+    def observe(self, view, status, duration, stats, size):
+        with self.lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = ViewMetrics(self.recent)
+            metrics.observe(status, duration, stats, size)
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    def _histogram(self, lines, name, help_text, bounds, field, sum_field, views):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for view, metrics in views:
+            cumulative = 0
+            for bound, count in zip((*bounds, '+Inf'), getattr(metrics, field)):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{_label(view)}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{view="{_label(view)}"}} {_number(getattr(metrics, sum_field))}')
+            lines.append(f'{name}_count{{view="{_label(view)}"}} {metrics.requests}')
+
+    def _counter(self, lines, name, help_text, field, views):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view, metrics in views:
+            lines.append(f'{name}{{view="{_label(view)}"}} {_number(getattr(metrics, field))}')
+
+    def render(self):
+        """The registry in the Prometheus text exposition format"""
+        with self.lock:
+            views = sorted(
+                (view, metrics, sorted(metrics.recent), dict(metrics.statuses))
+                for view, metrics in self.views.items()
+            )
+            lines = []
+            p = self.prefix
+            lines += [f'# HELP {p}_requests_total Requests served by view and status class',
+                      f'# TYPE {p}_requests_total counter']
+            for view, _, _, statuses in views:
+                for status, count in sorted(statuses.items()):
+                    lines.append(f'{p}_requests_total{{view="{_label(view)}",status="{status}"}} {count}')
+            pairs = [(view, metrics) for view, metrics, _, _ in views]
+            self._histogram(lines, f'{p}_request_duration_seconds', 'Wall time of requests',
+                            DURATION_BUCKETS, 'duration_counts', 'duration_sum', pairs)
+            self._histogram(lines, f'{p}_request_queries', 'Database queries per request',
+                            QUERY_BUCKETS, 'query_counts', 'query_sum', pairs)
+            self._counter(lines, f'{p}_request_db_seconds_total', 'Time spent in database queries', 'db_seconds', pairs)
+            self._counter(lines, f'{p}_request_template_seconds_total', 'Time spent rendering templates',
+                          'template_seconds', pairs)
+            self._counter(lines, f'{p}_response_bytes_total', 'Response body bytes', 'response_bytes', pairs)
+
+        name = f'{p}_request_duration_recent_seconds'
+        lines += [f'# HELP {name} Quantiles of the most recent request durations', f'# TYPE {name} gauge']
+        for view, _, recent, _ in views:
+            for quantile in RECENT_QUANTILES:
+                value = recent[min(len(recent) - 1, int(quantile * len(recent)))]
+                lines.append(f'{name}{{view="{_label(view)}",quantile="{quantile}"}} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(getattr(settings, 'REQUEST_METRICS_RECENT', 500))
+
+
+class RequestMetricsMiddleware:
+    """
+    Record wall time, queries, database time, template time and response size per view.
+
+    Put it first in ``MIDDLEWARE`` so session and user lookups count too.
+    With ``REQUEST_METRICS_SERVER_TIMING`` the numbers are also sent to the
+    browser in a ``Server-Timing`` header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_execute_wrapper(_time_query)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start, stats = time.perf_counter(), RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, start, stats)
+
+    async def __acall__(self, request):
+        start, stats = time.perf_counter(), RequestStats()
+        # Threads started through sync_to_async copy this context, so their
+        # queries and renders land on the same stats object
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, start, stats)
+
+    def finish(self, request, response, start, stats):
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        if response.streaming:
+            size = int(response.headers.get('Content-Length', 0))
+        else:
+            size = len(response.content)
+        registry.observe(view, response.status_code, duration, stats, size)
+
+        if self.server_timing:
+            timing = (
+                f'app;dur={duration * 1000:.1f}, '
+                f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+                f'tpl;dur={stats.template_seconds * 1000:.1f}'
+            )
+            existing = response.headers.get('Server-Timing')
+            response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+        return response
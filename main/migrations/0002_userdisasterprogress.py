@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    """Build rollups for history recorded before the table existed"""
+    from main.progress import rebuild_rollups
+    rebuild_rollups()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDisasterProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modules_completed', models.PositiveIntegerField(default=0)),
+                ('quiz_attempts', models.PositiveIntegerField(default=0)),
+                ('quiz_score_sum', models.FloatField(default=0)),
+                ('best_quiz_score', models.FloatField(default=0)),
+                ('last_quiz_score', models.FloatField(default=0)),
+                ('drill_completions', models.PositiveIntegerField(default=0)),
+                ('drill_score_sum', models.FloatField(default=0)),
+                ('best_drill_score', models.FloatField(default=0)),
+                ('last_drill_score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('disaster_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_progress', to='main.disastertype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disaster_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'User disaster progress',
+                'unique_together': {('user', 'disaster_type')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
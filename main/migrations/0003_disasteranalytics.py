@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_analytics(apps, schema_editor):
+    """Build snapshots for history recorded before the table existed"""
+    from main.analytics import rebuild_analytics
+    rebuild_analytics()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_userdisasterprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisasterAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('institution', models.CharField(blank=True, max_length=200)),
+                ('grade_level', models.CharField(blank=True, max_length=50)),
+                ('modules_completed', models.PositiveIntegerField(default=0)),
+                ('quiz_attempts', models.PositiveIntegerField(default=0)),
+                ('quiz_score_sum', models.FloatField(default=0)),
+                ('drill_completions', models.PositiveIntegerField(default=0)),
+                ('drill_score_sum', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('disaster_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics', to='main.disastertype')),
+            ],
+            options={
+                'verbose_name_plural': 'Disaster analytics',
+                'unique_together': {('disaster_type', 'institution', 'grade_level')},
+            },
+        ),
+        migrations.RunPython(backfill_analytics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_disasteranalytics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='drillcompletion',
+            index=models.Index(fields=['user', 'drill_checklist', '-completed_at'], name='drillcomp_user_drill_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moduleprogress',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['user', '-completion_date'], name='modprog_user_done_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moduleprogress',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['-completion_date'], name='modprog_done_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'quiz', '-completed_at'], name='quizatt_user_quiz_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', '-completed_at'], name='quizatt_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['-completed_at'], name='quizatt_date_idx'),
+        ),
+    ]
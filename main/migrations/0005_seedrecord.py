@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('applied_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
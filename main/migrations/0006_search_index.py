@@ -0,0 +1,31 @@
+from django.db import migrations, OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    """Create the FTS5 search table on SQLite builds that include FTS5; others use the in-process index"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS main_search_index USING fts5("
+            "kind UNINDEXED, object_id UNINDEXED, parent_id UNINDEXED, heading UNINDEXED, title, body, "
+            "tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        pass
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS main_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_seedrecord'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
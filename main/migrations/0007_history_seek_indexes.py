@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='drillcompletion',
+            name='drillcomp_user_drill_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='moduleprogress',
+            name='modprog_user_done_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='quizattempt',
+            name='quizatt_user_quiz_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='quizattempt',
+            name='quizatt_user_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='drillcompletion',
+            index=models.Index(fields=['user', 'drill_checklist', '-completed_at', '-id'], name='drillcomp_user_drill_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drillcompletion',
+            index=models.Index(fields=['user', '-completed_at', '-id'], name='drillcomp_user_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moduleprogress',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['user', '-completion_date', '-id'], name='modprog_user_done_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'quiz', '-completed_at', '-id'], name='quizatt_user_quiz_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', '-completed_at', '-id'], name='quizatt_user_seek_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_history_seek_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='quizattempt',
+            name='quizatt_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='drillcompletion',
+            index=models.Index(fields=['-completed_at', '-id'], name='drillcomp_date_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['-completed_at', '-id'], name='quizatt_date_seek_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'main_user_username_ci'
+
+
+def create_username_index(apps, schema_editor):
+    """Index usernames case-insensitively so the admin's istartswith search is a range seek"""
+    table = schema_editor.quote_name(apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table)
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # SQLite only turns LIKE 'prefix%' into a seek on a NOCASE index
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {table} (username COLLATE NOCASE)')
+    elif vendor == 'postgresql':
+        # Django compares UPPER(username::text) LIKE UPPER(%s) for istartswith
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {table} (UPPER(username::text) text_pattern_ops)'
+        )
+
+
+def drop_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_changelist_date_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_index, drop_username_index),
+    ]
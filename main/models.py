@@ -122,6 +122,10 @@ class ModuleProgress(models.Model):
     
     class Meta:
         unique_together = ['user', 'module']
+        indexes = [
+            models.Index(fields=['user', '-completion_date', '-id'], name='modprog_user_done_seek_idx', condition=models.Q(completed=True)),
+            models.Index(fields=['-completion_date'], name='modprog_done_date_idx', condition=models.Q(completed=True)),
+        ]
 
 class QuizAttempt(models.Model):
     """Track user quiz attempts"""
@@ -138,6 +142,11 @@ class QuizAttempt(models.Model):
     
     class Meta:
         ordering = ['-completed_at']
+        indexes = [
+            models.Index(fields=['user', 'quiz', '-completed_at', '-id'], name='quizatt_user_quiz_seek_idx'),
+            models.Index(fields=['user', '-completed_at', '-id'], name='quizatt_user_seek_idx'),
+            models.Index(fields=['-completed_at', '-id'], name='quizatt_date_seek_idx'),
+        ]
 
 class DrillCompletion(models.Model):
     """Track user drill completions"""
@@ -154,6 +163,11 @@ class DrillCompletion(models.Model):
     
     class Meta:
         ordering = ['-completed_at']
+        indexes = [
+            models.Index(fields=['user', 'drill_checklist', '-completed_at', '-id'], name='drillcomp_user_drill_seek_idx'),
+            models.Index(fields=['user', '-completed_at', '-id'], name='drillcomp_user_seek_idx'),
+            models.Index(fields=['-completed_at', '-id'], name='drillcomp_date_seek_idx'),
+        ]
 
 class EmergencyContact(models.Model):
     """Model for emergency contacts"""
@@ -177,3 +191,61 @@ class EmergencyContact(models.Model):
     
     class Meta:
         ordering = ['contact_type', 'name']
+
+class UserDisasterProgress(models.Model):
+    """Denormalized per-user progress for a disaster type, maintained on write"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='disaster_progress')
+    disaster_type = models.ForeignKey(DisasterType, on_delete=models.CASCADE, related_name='user_progress')
+    modules_completed = models.PositiveIntegerField(default=0)
+    quiz_attempts = models.PositiveIntegerField(default=0)
+    quiz_score_sum = models.FloatField(default=0)
+    best_quiz_score = models.FloatField(default=0)
+    last_quiz_score = models.FloatField(default=0)
+    drill_completions = models.PositiveIntegerField(default=0)
+    drill_score_sum = models.FloatField(default=0)
+    best_drill_score = models.FloatField(default=0)
+    last_drill_score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.disaster_type.name}"
+    
+    @property
+    def avg_quiz_score(self):
+        return self.quiz_score_sum / self.quiz_attempts if self.quiz_attempts else 0
+    
+    @property
+    def avg_drill_score(self):
+        return self.drill_score_sum / self.drill_completions if self.drill_completions else 0
+    
+    class Meta:
+        verbose_name_plural = "User disaster progress"
+        unique_together = ['user', 'disaster_type']
+
+class DisasterAnalytics(models.Model):
+    """Aggregated activity per disaster type, institution and grade, maintained on write"""
+    disaster_type = models.ForeignKey(DisasterType, on_delete=models.CASCADE, related_name='analytics')
+    institution = models.CharField(max_length=200, blank=True)
+    grade_level = models.CharField(max_length=50, blank=True)
+    modules_completed = models.PositiveIntegerField(default=0)
+    quiz_attempts = models.PositiveIntegerField(default=0)
+    quiz_score_sum = models.FloatField(default=0)
+    drill_completions = models.PositiveIntegerField(default=0)
+    drill_score_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.disaster_type.name} - {self.institution or 'No institution'} - {self.grade_level or 'No grade'}"
+    
+    class Meta:
+        verbose_name_plural = "Disaster analytics"
+        unique_together = ['disaster_type', 'institution', 'grade_level']
+
+class SeedRecord(models.Model):
+    """Fingerprint of the seed data last applied, so startup can skip re-seeding"""
+    name = models.CharField(max_length=100, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    applied_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.fingerprint[:12]})"
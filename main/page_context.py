@@ -0,0 +1,48 @@
+from . import curriculum
+from .models import ModuleProgress
+
+# Attribute defaults for disaster types with no curriculum rows yet
+EMPTY_SUMMARY = {
+    'module_count': 0,
+    'quiz_count': 0,
+    'drill_count': 0,
+    'first_module_id': None,
+    'first_quiz_id': None,
+    'first_drill_id': None,
+}
+
+
+def attach_disaster_summaries(disaster_types):
+    """
+    Set module/quiz/drill counts and first ids as plain attributes.
+
+    Templates read ``disaster.module_count`` or ``disaster.first_quiz_id``
+    instead of calling ``disaster.modules.count`` or ``disaster.quizzes.first``,
+    which would issue a query per disaster type.
+    """
+    summaries = curriculum.get_disaster_summaries()
+    for disaster_type in disaster_types:
+        for name, value in summaries.get(disaster_type.id, EMPTY_SUMMARY).items():
+            setattr(disaster_type, name, value)
+    return disaster_types
+
+
+def attach_user_progress(disaster_types, user_progress):
+    """Set each disaster type's progress entry as ``disaster.progress``"""
+    for disaster_type in disaster_types:
+        disaster_type.progress = user_progress[disaster_type.id]
+    return disaster_types
+
+
+def attach_module_completion(user, modules):
+    """Set ``module.is_completed`` for the user with a single query"""
+    completed_ids = set(
+        ModuleProgress.objects.filter(
+            user=user,
+            module__in=[module.id for module in modules],
+            completed=True
+        ).values_list('module_id', flat=True)
+    )
+    for module in modules:
+        module.is_completed = module.id in completed_ids
+    return modules
@@ -0,0 +1,319 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import curriculum
+from .analytics import record_activity
+from .models import (
+    ModuleProgress, QuizAttempt, DrillCompletion, UserDisasterProgress
+)
+
+# Optional per-item sections of the batched progress API
+PROGRESS_DETAILS = ('modules', 'quizzes')
+
+# Rollup fields that can be recomputed from the raw history tables
+ROLLUP_FIELDS = [
+    'modules_completed',
+    'quiz_attempts', 'quiz_score_sum', 'best_quiz_score', 'last_quiz_score',
+    'drill_completions', 'drill_score_sum', 'best_drill_score', 'last_drill_score',
+]
+
+
+def empty_progress():
+    """Progress entry for a disaster type the user has not touched yet"""
+    return {
+        'modules_completed': 0,
+        'total_modules': 0,
+        'completion_rate': 0,
+        'quiz_attempts': 0,
+        'best_quiz_score': 0,
+        'last_quiz_score': 0,
+        'avg_quiz_score': 0,
+        'drill_completions': 0,
+        'best_drill_score': 0,
+        'last_drill_score': 0,
+        'avg_drill_score': 0,
+    }
+
+
+def _progress_ids(disaster_types):
+    return [getattr(disaster_type, 'pk', disaster_type) for disaster_type in disaster_types]
+
+
+def _build_progress(ids, summaries, rollups):
+    """Combine curriculum module totals and rollup rows into progress dicts"""
+    user_progress = {disaster_id: empty_progress() for disaster_id in ids}
+    for disaster_id in ids:
+        if disaster_id in summaries:
+            user_progress[disaster_id]['total_modules'] = summaries[disaster_id]['module_count']
+
+    for rollup in rollups:
+        progress = user_progress[rollup.disaster_type_id]
+        progress['modules_completed'] = rollup.modules_completed
+        progress['quiz_attempts'] = rollup.quiz_attempts
+        progress['best_quiz_score'] = rollup.best_quiz_score
+        progress['last_quiz_score'] = rollup.last_quiz_score
+        progress['avg_quiz_score'] = rollup.avg_quiz_score
+        progress['drill_completions'] = rollup.drill_completions
+        progress['best_drill_score'] = rollup.best_drill_score
+        progress['last_drill_score'] = rollup.last_drill_score
+        progress['avg_drill_score'] = rollup.avg_drill_score
+
+    for progress in user_progress.values():
+        if progress['total_modules'] > 0:
+            progress['completion_rate'] = progress['modules_completed'] / progress['total_modules'] * 100
+
+    return user_progress
+
+
+def get_user_progress(user, disaster_types):
+    """
+    Compute a user's progress for the given disaster types.
+
+    Progress is read from the UserDisasterProgress rollup and module totals
+    from the curriculum cache, so the cost is a single query no matter how
+    many disaster types are requested. Returns a dict keyed by disaster type id.
+    """
+    ids = _progress_ids(disaster_types)
+    if not ids:
+        return {}
+
+    rollups = UserDisasterProgress.objects.filter(user=user, disaster_type__in=ids)
+    return _build_progress(ids, curriculum.get_disaster_summaries(), rollups)
+
+
+async def aget_user_progress(user, disaster_types):
+    """
+    Async variant of ``get_user_progress``.
+
+    The async ORM and ``sync_to_async`` run every call on the one shared
+    thread, so the cache lookup and rollup query run one after the other;
+    the gain is that the event loop is free while they do.
+    """
+    ids = _progress_ids(disaster_types)
+    if not ids:
+        return {}
+
+    summaries = await sync_to_async(curriculum.get_disaster_summaries)()
+    rollups = [rollup async for rollup in UserDisasterProgress.objects.filter(user=user, disaster_type__in=ids)]
+    return _build_progress(ids, summaries, rollups)
+
+
+def _progress_stamp_aggregates():
+    return {
+        'rows': Count('id'),
+        'latest': Max('updated_at'),
+        'events': Sum(F('modules_completed') + F('quiz_attempts') + F('drill_completions')),
+    }
+
+
+def get_progress_stamp(user):
+    """
+    Cheap fingerprint of a user's rollup rows.
+
+    Every recorded module, quiz or drill bumps a counter and ``updated_at``
+    on a rollup row, so the stamp changes whenever any progress does.
+    """
+    return UserDisasterProgress.objects.filter(user=user).aggregate(**_progress_stamp_aggregates())
+
+
+async def aget_progress_stamp(user):
+    """Async variant of ``get_progress_stamp``"""
+    return await UserDisasterProgress.objects.filter(user=user).aaggregate(**_progress_stamp_aggregates())
+
+
+async def aget_progress_detail(user, disaster_type_ids, detail):
+    """
+    Per-module completion and per-quiz attempt stats for the given disaster types.
+
+    ``detail`` is a subset of PROGRESS_DETAILS; each requested section costs
+    one query. Returns a dict keyed by disaster type id.
+    """
+    outline = await sync_to_async(curriculum.get_curriculum_outline)()
+    sections = {disaster_id: outline.get(disaster_id, {'modules': [], 'quizzes': []}) for disaster_id in disaster_type_ids}
+    module_ids = [module['id'] for section in sections.values() for module in section['modules']]
+    quiz_ids = [quiz['id'] for section in sections.values() for quiz in section['quizzes']]
+
+    async def load_completions():
+        if 'modules' not in detail or not module_ids:
+            return {}
+        rows = ModuleProgress.objects.filter(
+            user=user, completed=True, module_id__in=module_ids
+        ).values_list('module_id', 'completion_date')
+        return {module_id: completion_date async for module_id, completion_date in rows}
+
+    async def load_quiz_stats():
+        if 'quizzes' not in detail or not quiz_ids:
+            return {}
+        rows = QuizAttempt.objects.filter(user=user, quiz_id__in=quiz_ids).values('quiz_id').annotate(
+            attempts=Count('id'),
+            best_score=Max('score'),
+            avg_score=Avg('score'),
+            last_attempt_at=Max('completed_at'),
+        ).order_by()
+        return {row.pop('quiz_id'): row async for row in rows}
+
+    completions = await load_completions()
+    quiz_stats = await load_quiz_stats()
+
+    result = {}
+    for disaster_id, section in sections.items():
+        result[disaster_id] = {}
+        if 'modules' in detail:
+            result[disaster_id]['modules'] = [
+                {
+                    **module,
+                    'completed': module['id'] in completions,
+                    'completion_date': completions.get(module['id']),
+                }
+                for module in section['modules']
+            ]
+        if 'quizzes' in detail:
+            empty = {'attempts': 0, 'best_score': None, 'avg_score': None, 'last_attempt_at': None}
+            result[disaster_id]['quizzes'] = [
+                {**quiz, **quiz_stats.get(quiz['id'], empty)}
+                for quiz in section['quizzes']
+            ]
+    return result
+
+
+def _update_rollup(user, disaster_type_id, **changes):
+    """Apply F-expression updates to a user's rollup row, creating it if needed"""
+    with transaction.atomic():
+        UserDisasterProgress.objects.get_or_create(user=user, disaster_type_id=disaster_type_id)
+        UserDisasterProgress.objects.filter(
+            user=user, disaster_type_id=disaster_type_id
+        ).update(updated_at=timezone.now(), **changes)
+
+
+def record_module_completion(user, disaster_type_id):
+    """Count a newly completed module in the user's rollup and analytics"""
+    _update_rollup(
+        user, disaster_type_id,
+        modules_completed=F('modules_completed') + 1,
+    )
+    record_activity(user, disaster_type_id, modules_completed=1)
+
+
+def record_quiz_attempt(user, disaster_type_id, score):
+    """Add a quiz score to the user's rollup and analytics"""
+    _update_rollup(
+        user, disaster_type_id,
+        quiz_attempts=F('quiz_attempts') + 1,
+        quiz_score_sum=F('quiz_score_sum') + score,
+        best_quiz_score=Greatest(F('best_quiz_score'), Value(float(score))),
+        last_quiz_score=score,
+    )
+    record_activity(user, disaster_type_id, quiz_score=score)
+
+
+def record_drill_completion(user, disaster_type_id, completion_percentage):
+    """Add a drill completion percentage to the user's rollup and analytics"""
+    _update_rollup(
+        user, disaster_type_id,
+        drill_completions=F('drill_completions') + 1,
+        drill_score_sum=F('drill_score_sum') + completion_percentage,
+        best_drill_score=Greatest(F('best_drill_score'), Value(float(completion_percentage))),
+        last_drill_score=completion_percentage,
+    )
+    record_activity(user, disaster_type_id, drill_score=completion_percentage)
+
+
+def compute_rollups_from_history(user_ids=None):
+    """
+    Recompute rollup values from the raw progress, attempt and completion tables.
+
+    Attempts are streamed in completion order so the last score can be taken
+    without loading whole tables into memory. Returns a dict keyed by
+    (user_id, disaster_type_id).
+    """
+    rollups = {}
+
+    def rollup_for(key):
+        if key not in rollups:
+            rollups[key] = {field: 0 for field in ROLLUP_FIELDS}
+        return rollups[key]
+
+    module_progress = ModuleProgress.objects.filter(completed=True)
+    quiz_attempts = QuizAttempt.objects.all()
+    drill_completions = DrillCompletion.objects.all()
+    if user_ids is not None:
+        module_progress = module_progress.filter(user_id__in=user_ids)
+        quiz_attempts = quiz_attempts.filter(user_id__in=user_ids)
+        drill_completions = drill_completions.filter(user_id__in=user_ids)
+
+    completed_modules = module_progress.values(
+        'user_id', 'module__disaster_type_id'
+    ).annotate(completed=Count('id')).order_by()
+    for row in completed_modules:
+        rollup_for((row['user_id'], row['module__disaster_type_id']))['modules_completed'] = row['completed']
+
+    quiz_rows = quiz_attempts.order_by('completed_at', 'id').values_list(
+        'user_id', 'quiz__disaster_type_id', 'score'
+    )
+    for user_id, disaster_type_id, score in quiz_rows.iterator(chunk_size=2000):
+        rollup = rollup_for((user_id, disaster_type_id))
+        rollup['quiz_attempts'] += 1
+        rollup['quiz_score_sum'] += score
+        rollup['best_quiz_score'] = max(rollup['best_quiz_score'], score)
+        rollup['last_quiz_score'] = score
+
+    drill_rows = drill_completions.order_by('completed_at', 'id').values_list(
+        'user_id', 'drill_checklist__disaster_type_id', 'completion_percentage'
+    )
+    for user_id, disaster_type_id, percentage in drill_rows.iterator(chunk_size=2000):
+        rollup = rollup_for((user_id, disaster_type_id))
+        rollup['drill_completions'] += 1
+        rollup['drill_score_sum'] += percentage
+        rollup['best_drill_score'] = max(rollup['best_drill_score'], percentage)
+        rollup['last_drill_score'] = percentage
+
+    return rollups
+
+
+def rebuild_rollups(user_ids=None, batch_size=1000):
+    """Replace stored rollups with values recomputed from history"""
+    rollups = compute_rollups_from_history(user_ids)
+    existing = UserDisasterProgress.objects.all()
+    if user_ids is not None:
+        existing = existing.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        existing.delete()
+        UserDisasterProgress.objects.bulk_create(
+            [
+                UserDisasterProgress(user_id=user_id, disaster_type_id=disaster_type_id, **values)
+                for (user_id, disaster_type_id), values in rollups.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(rollups)
+
+
+def find_rollup_mismatches(user_ids=None, tolerance=1e-6):
+    """
+    Compare stored rollups against history.
+
+    Returns a list of (user_id, disaster_type_id, field, stored, expected)
+    tuples; an empty list means the rollup table is consistent.
+    """
+    expected = compute_rollups_from_history(user_ids)
+    stored_rows = UserDisasterProgress.objects.all()
+    if user_ids is not None:
+        stored_rows = stored_rows.filter(user_id__in=user_ids)
+    stored = {
+        (row['user_id'], row['disaster_type_id']): row
+        for row in stored_rows.values('user_id', 'disaster_type_id', *ROLLUP_FIELDS)
+    }
+
+    empty = {field: 0 for field in ROLLUP_FIELDS}
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        stored_values = stored.get(key, empty)
+        expected_values = expected.get(key, empty)
+        for field in ROLLUP_FIELDS:
+            if abs(stored_values[field] - expected_values[field]) > tolerance:
+                mismatches.append((key[0], key[1], field, stored_values[field], expected_values[field]))
+    return mismatches
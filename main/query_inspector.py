@@ -0,0 +1,178 @@
+import contextvars
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+
+from . import metrics
+from .metrics import install_execute_wrapper
+
+logger = logging.getLogger(__name__)
+
+INSPECTOR_MODES = ('off', 'log', 'raise')
+
+_current = contextvars.ContextVar('query_log', default=None)
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+# Execute wrappers sit between the caller and the database; never report them as the origin
+_WRAPPER_FILES = {os.path.abspath(__file__), os.path.abspath(metrics.__file__)}
+
+
+class QueryInspectionError(Exception):
+    """Raised at the end of a request with N+1 or slow queries when QUERY_INSPECTOR is 'raise'"""
+
+
+def sql_shape(sql):
+    """SQL with IN lists of any length folded together, so repeated lookups group as one shape"""
+    return _WHITESPACE.sub(' ', _IN_LIST.sub('(%s, ...)', sql)).strip()
+
+
+def query_origin():
+    """
+    Where the running query came from, as (code, template).
+
+    ``code`` is the innermost project frame outside third-party packages and
+    ``template`` the template line whose node is being rendered, if any.
+    Queries made through the async ORM run on a worker thread whose stack
+    does not include the calling coroutine, so their code origin is unknown.
+    """
+    code = template = None
+    frame = sys._getframe(1)
+    while frame is not None and not (code and template):
+        filename = frame.f_code.co_filename
+        if (code is None and filename.startswith(_PROJECT_ROOT) and filename not in _WRAPPER_FILES
+                and 'site-packages' not in filename):
+            code = f'{os.path.relpath(filename, _PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name or origin.name}:{token.lineno}'
+        frame = frame.f_back
+    return code, template
+
+
+class QueryLog:
+    """Queries of one request grouped by shape, with the slow ones kept apart"""
+
+    def __init__(self):
+        self.shapes = {}
+        self.slow = []
+
+    def add(self, sql, duration, origin):
+        shape = sql_shape(sql)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            entry = self.shapes[shape] = {'count': 0, 'seconds': 0.0, 'origins': Counter()}
+        entry['count'] += 1
+        entry['seconds'] += duration
+        entry['origins'][origin] += 1
+        if duration >= settings.QUERY_INSPECTOR_SLOW_MS / 1000:
+            self.slow.append((shape, duration, origin))
+
+    def problems(self):
+        """Readable descriptions of repeated shapes over the N+1 threshold and of slow queries"""
+        found = []
+        for shape, entry in self.shapes.items():
+            if entry['count'] >= settings.QUERY_INSPECTOR_REPEATS:
+                found.append(
+                    f"N+1: {entry['count']} queries of one shape ({entry['seconds'] * 1000:.1f}ms)\n"
+                    f"    {shape[:300]}\n"
+                    + ''.join(f'    {count}x {_where(origin)}\n' for origin, count in entry['origins'].most_common(3))
+                )
+        for shape, duration, origin in self.slow:
+            found.append(f'Slow query ({duration * 1000:.1f}ms)\n    {shape[:300]}\n    {_where(origin)}\n')
+        return found
+
+
+def _where(origin):
+    code, template = origin
+    parts = [f'from {code}' if code else 'from outside the project']
+    if template:
+        parts.append(f'template {template}')
+    return ', '.join(parts)
+
+
+def _inspect_query(execute, sql, params, many, context):
+    log = _current.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.add(sql, time.perf_counter() - start, query_origin())
+
+
+@contextmanager
+def inspect_queries():
+    """Collect the queries run inside the block, in this thread and threads it hands work to"""
+    install_execute_wrapper(_inspect_query)
+    log = QueryLog()
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+
+
+class QueryInspectorMiddleware:
+    """
+    Report N+1 query patterns and slow queries per request.
+
+    Off unless QUERY_INSPECTOR is 'log', which logs a warning naming the
+    view, or 'raise', which fails the request with QueryInspectionError.
+    A shape repeated QUERY_INSPECTOR_REPEATS times counts as N+1, and any
+    query taking QUERY_INSPECTOR_SLOW_MS or more as slow. Meant for
+    development and staging; walking the stack on every query is not free.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'QUERY_INSPECTOR', 'off')
+        if self.mode not in INSPECTOR_MODES:
+            raise ImproperlyConfigured(f"QUERY_INSPECTOR must be one of {', '.join(INSPECTOR_MODES)}")
+        if self.mode == 'off':
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with inspect_queries() as log:
+            response = self.get_response(request)
+        self.report(request, log)
+        return response
+
+    async def __acall__(self, request):
+        with inspect_queries() as log:
+            response = await self.get_response(request)
+        self.report(request, log)
+        return response
+
+    def report(self, request, log):
+        problems = log.problems()
+        if not problems:
+            return
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        message = (
+            f"{len(problems)} query problem{'s' if len(problems) > 1 else ''} in view {view} "
+            f"({request.method} {request.path}):\n" + ''.join(problems)
+        )
+        if self.mode == 'raise':
+            raise QueryInspectionError(message)
+        logger.warning(message)
@@ -0,0 +1,448 @@
+import bisect
+import gc
+import html
+import math
+import re
+import threading
+from collections import Counter
+
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils.html import escape, strip_tags
+
+from . import curriculum
+from .models import DisasterType, EducationModule, Quiz, QuizQuestion, DrillChecklist, DrillStep, EmergencyContact
+
+FTS_TABLE = 'main_search_index'
+
+# Row ids in the FTS table are object_id * KIND_SLOTS + kind code, so a
+# document can be replaced or removed by rowid without scanning
+KIND_CODES = {'module': 1, 'question': 2, 'step': 3, 'contact': 4}
+KIND_SLOTS = 8
+KIND_MODELS = {
+    'module': EducationModule,
+    'question': QuizQuestion,
+    'step': DrillStep,
+    'contact': EmergencyContact,
+}
+
+# Title matches count five times as much as body matches
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+MAX_TERMS = 10
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+_WHITESPACE = re.compile(r'\s+')
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+
+def html_to_text(value):
+    """Visible text of an HTML fragment with whitespace collapsed"""
+    return _WHITESPACE.sub(' ', html.unescape(strip_tags(value or ''))).strip()
+
+
+def tokenize(text):
+    return [token.lower() for token in _TOKEN.findall(text)]
+
+
+def parse_query(query):
+    """Search terms of a user query; the last term also matches as a prefix"""
+    return tokenize(query)[:MAX_TERMS]
+
+
+def kind_for(instance):
+    for kind, model in KIND_MODELS.items():
+        if isinstance(instance, model):
+            return kind
+    return None
+
+
+def document_for(kind, obj):
+    """
+    Searchable document for a curriculum object, or None if it should not be indexed.
+
+    ``heading`` and ``parent_id`` are stored for display and linking only;
+    ``title`` and ``body`` are searched.
+    """
+    if kind == 'module':
+        return {
+            'kind': kind, 'object_id': obj.id, 'parent_id': obj.disaster_type_id,
+            'heading': obj.disaster_type.name, 'title': obj.title, 'body': html_to_text(obj.content),
+        }
+    if kind == 'question':
+        options = ' '.join([obj.option_a, obj.option_b, obj.option_c, obj.option_d])
+        return {
+            'kind': kind, 'object_id': obj.id, 'parent_id': obj.quiz_id,
+            'heading': obj.quiz.title, 'title': obj.question_text, 'body': f'{options} {obj.explanation}'.strip(),
+        }
+    if kind == 'step':
+        return {
+            'kind': kind, 'object_id': obj.id, 'parent_id': obj.drill_checklist_id,
+            'heading': obj.drill_checklist.title, 'title': obj.step_text, 'body': '',
+        }
+    if kind == 'contact':
+        if not obj.is_active:
+            return None
+        return {
+            'kind': kind, 'object_id': obj.id, 'parent_id': None,
+            'heading': obj.organization, 'title': obj.name,
+            'body': ' '.join([obj.organization, obj.get_contact_type_display(), obj.phone_number, obj.email]).strip(),
+        }
+    raise ValueError(f'Unknown search kind {kind!r}')
+
+
+def iter_documents():
+    """Every indexable document in the curriculum, streamed from the database"""
+    querysets = {
+        'module': EducationModule.objects.select_related('disaster_type'),
+        'question': QuizQuestion.objects.select_related('quiz'),
+        'step': DrillStep.objects.select_related('drill_checklist'),
+        'contact': EmergencyContact.objects.filter(is_active=True),
+    }
+    for kind, queryset in querysets.items():
+        for obj in queryset.iterator(chunk_size=500):
+            document = document_for(kind, obj)
+            if document is not None:
+                yield document
+
+
+def result_url(kind, object_id, parent_id):
+    """Page a search result links to"""
+    if kind == 'module':
+        return reverse('module_detail', args=[object_id])
+    if kind == 'question':
+        return reverse('quiz_detail', args=[parent_id])
+    if kind == 'step':
+        return reverse('drill_checklist', args=[parent_id])
+    return reverse('emergency_contacts')
+
+
+def _result(kind, object_id, parent_id, heading, title, snippet, score):
+    return {
+        'kind': kind,
+        'id': object_id,
+        'heading': heading,
+        'title': title,
+        'snippet': snippet,
+        'url': result_url(kind, object_id, parent_id),
+        'score': round(score, 4),
+    }
+
+
+def _highlight(text):
+    """Escape FTS snippet text, turning the match markers into <mark> tags"""
+    return escape(text).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+class Fts5Backend:
+    """Inverted index in an SQLite FTS5 virtual table, ranked with bm25()"""
+
+    name = 'fts5'
+
+    @staticmethod
+    def available():
+        if connection.vendor != 'sqlite':
+            return False
+        return FTS_TABLE in connection.introspection.table_names()
+
+    @staticmethod
+    def _rowid(kind, object_id):
+        return object_id * KIND_SLOTS + KIND_CODES[kind]
+
+    def index(self, documents):
+        with transaction.atomic(), connection.cursor() as cursor:
+            for document in documents:
+                rowid = self._rowid(document['kind'], document['object_id'])
+                cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid])
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, kind, object_id, parent_id, heading, title, body) '
+                    'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                    [rowid, document['kind'], document['object_id'], document['parent_id'],
+                     document['heading'], document['title'], document['body']],
+                )
+
+    def remove(self, kind, object_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [self._rowid(kind, object_id)])
+
+    def rebuild(self):
+        count = 0
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+                batch = []
+                for document in iter_documents():
+                    batch.append([
+                        self._rowid(document['kind'], document['object_id']), document['kind'],
+                        document['object_id'], document['parent_id'], document['heading'],
+                        document['title'], document['body'],
+                    ])
+                    if len(batch) >= 500:
+                        self._insert(cursor, batch)
+                        count += len(batch)
+                        batch = []
+                self._insert(cursor, batch)
+                count += len(batch)
+                cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return count
+
+    def _insert(self, cursor, rows):
+        if rows:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, kind, object_id, parent_id, heading, title, body) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                rows,
+            )
+
+    def is_empty(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT 1 FROM {FTS_TABLE} LIMIT 1')
+            return cursor.fetchone() is None
+
+    def search(self, terms, kinds, limit):
+        # Quote every term so user input can never be parsed as FTS syntax. Prefix
+        # queries bypass the porter stemmer, so the last term matches either way
+        *leading, last = [f'"{term}"' for term in terms]
+        expression = ' AND '.join([*leading, f'({last} OR {last}*)'])
+        kind_filter = ''
+        params = [_MARK_START, _MARK_END, expression]
+        if kinds:
+            kind_filter = f" AND kind IN ({', '.join(['%s'] * len(kinds))})"
+            params += list(kinds)
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT kind, object_id, parent_id, heading, title, '
+                f"snippet({FTS_TABLE}, -1, %s, %s, '…', 16), "
+                f'bm25({FTS_TABLE}, 0, 0, 0, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s{kind_filter} ORDER BY rank LIMIT %s',
+                params,
+            )
+            return [
+                _result(kind, object_id, parent_id, heading, title, _highlight(snippet), -rank)
+                for kind, object_id, parent_id, heading, title, snippet, rank in cursor.fetchall()
+            ]
+
+
+class MemoryBackend:
+    """
+    In-process inverted index ranked with BM25, for databases without FTS5.
+
+    Built from the database on first use and updated on save. Each process
+    holds its own copy, so the index also remembers the curriculum version
+    it reflects and rebuilds when another process has changed the curriculum.
+    """
+
+    name = 'memory'
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._version = None
+        self._clear()
+
+    def _clear(self):
+        self._documents, self._postings, self._lengths, self._tokens = {}, {}, {}, {}
+        self._vocabulary = None
+
+    def _add(self, document):
+        key = (document['kind'], document['object_id'])
+        self._remove(key)
+        title, body = Counter(tokenize(document['title'])), Counter(tokenize(document['body']))
+        self._documents[key] = document
+        self._lengths[key] = (sum(title.values()), sum(body.values()))
+        self._tokens[key] = title.keys() | body.keys()
+        postings = self._postings
+        for token, tf in body.items():
+            postings.setdefault(token, {})[key] = (title.get(token, 0), tf)
+        for token, tf in title.items():
+            if token not in body:
+                postings.setdefault(token, {})[key] = (tf, 0)
+        self._vocabulary = None
+
+    def _remove(self, key):
+        if self._documents.pop(key, None) is None:
+            return
+        self._lengths.pop(key)
+        for token in self._tokens.pop(key):
+            postings = self._postings[token]
+            del postings[key]
+            if not postings:
+                del self._postings[token]
+        self._vocabulary = None
+
+    def _ensure_current(self):
+        version = curriculum.get_version()
+        if not self._built or version != self._version:
+            self._rebuild(version)
+
+    def _rebuild(self, version):
+        self._clear()
+        # Millions of small posting tuples make the cyclic GC dominate the build
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for document in iter_documents():
+                self._add(document)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        self._built, self._version = True, version
+
+    def _adopt_version(self):
+        # Our own save bumped the version by one; anything more means another process changed the curriculum
+        version = curriculum.get_version()
+        if self._version is not None and version == self._version + 1:
+            self._version = version
+
+    def index(self, documents):
+        with self._lock:
+            if not self._built:
+                return
+            for document in documents:
+                self._add(document)
+            self._adopt_version()
+
+    def remove(self, kind, object_id):
+        with self._lock:
+            if not self._built:
+                return
+            self._remove((kind, object_id))
+            self._adopt_version()
+
+    def rebuild(self):
+        with self._lock:
+            self._rebuild(curriculum.get_version())
+            return len(self._documents)
+
+    def is_empty(self):
+        return False
+
+    def _expand(self, term, prefix):
+        if not prefix:
+            return [term] if term in self._postings else []
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(self._vocabulary, term)
+        matches = []
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            matches.append(token)
+        return matches
+
+    def _snippet(self, document, terms):
+        text = document['body'] or document['title']
+        lowered = text.lower()
+        positions = [lowered.find(term) for term in terms if lowered.find(term) >= 0]
+        start = max(0, min(positions) - 60) if positions else 0
+        excerpt = text[start:start + 160]
+        marked = escape(excerpt)
+        for term in sorted(set(terms), key=len, reverse=True):
+            marked = re.sub(rf'(?i)\b({re.escape(escape(term))}\w*)', r'<mark>\1</mark>', marked)
+        return ('…' if start else '') + marked + ('…' if start + 160 < len(text) else '')
+
+    def search(self, terms, kinds, limit):
+        with self._lock:
+            self._ensure_current()
+            total = len(self._documents)
+            if not total:
+                return []
+            average_title = sum(length[0] for length in self._lengths.values()) / total or 1
+            average_body = sum(length[1] for length in self._lengths.values()) / total or 1
+
+            scores = None
+            for position, term in enumerate(terms):
+                term_scores = {}
+                for token in self._expand(term, prefix=position == len(terms) - 1):
+                    postings = self._postings[token]
+                    idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, (title_tf, body_tf) in postings.items():
+                        title_length, body_length = self._lengths[key]
+                        score = 0
+                        for tf, length, average, weight in (
+                            (title_tf, title_length, average_title, TITLE_WEIGHT),
+                            (body_tf, body_length, average_body, BODY_WEIGHT),
+                        ):
+                            if tf:
+                                norm = tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * length / average))
+                                score += weight * idf * norm
+                        term_scores[key] = max(term_scores.get(key, 0), score)
+                # Every term must match
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {key: scores[key] + value for key, value in term_scores.items() if key in scores}
+                if not scores:
+                    return []
+
+            ranked = sorted(
+                (key for key in scores if not kinds or key[0] in kinds),
+                key=lambda key: -scores[key],
+            )[:limit]
+            results = []
+            for key in ranked:
+                document = self._documents[key]
+                results.append(_result(
+                    document['kind'], document['object_id'], document['parent_id'], document['heading'],
+                    document['title'], self._snippet(document, terms), scores[key],
+                ))
+            return results
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """FTS5 when the index table exists on this database, otherwise the in-process index"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = Fts5Backend() if Fts5Backend.available() else MemoryBackend()
+            if _backend.is_empty():
+                _backend.rebuild()
+        return _backend
+
+
+def search(query, kinds=None, limit=20):
+    """Ranked search results for ``query``, optionally restricted to some kinds"""
+    terms = parse_query(query)
+    if not terms:
+        return []
+    return get_backend().search(terms, kinds or [], limit)
+
+
+def rebuild_index():
+    """Rebuild the whole search index from the database; returns the number of documents"""
+    return get_backend().rebuild()
+
+
+def index_instance(instance):
+    """Add or refresh the document of a saved curriculum object"""
+    kind = kind_for(instance)
+    document = document_for(kind, instance)
+    if document is None:
+        get_backend().remove(kind, instance.pk)
+    else:
+        get_backend().index([document])
+
+
+def remove_instance(instance):
+    get_backend().remove(kind_for(instance), instance.pk)
+
+
+def reindex_children(instance):
+    """Refresh documents whose heading shows this parent's name or title"""
+    if isinstance(instance, DisasterType):
+        children = ('module', EducationModule.objects.filter(disaster_type=instance).select_related('disaster_type'))
+    elif isinstance(instance, Quiz):
+        children = ('question', QuizQuestion.objects.filter(quiz=instance).select_related('quiz'))
+    elif isinstance(instance, DrillChecklist):
+        children = ('step', DrillStep.objects.filter(drill_checklist=instance).select_related('drill_checklist'))
+    else:
+        return
+    kind, queryset = children
+    get_backend().index([document_for(kind, child) for child in queryset])
@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from . import curriculum, search
+from .models import DisasterType, Quiz, DrillChecklist, ModuleProgress, QuizAttempt, DrillCompletion
+from .analytics import rebuild_analytics
+from .progress import rebuild_rollups
+
+
+class _CommitBatch:
+    """Values gathered during one transaction and passed to ``func`` in a single call"""
+
+    def __init__(self, func):
+        self.func = func
+        self.values = set()
+
+    def __call__(self):
+        self.func(sorted(self.values))
+
+
+def batch_on_commit(func, values):
+    """
+    Call ``func`` with ``values`` once the current transaction commits.
+
+    Values from every call in the same transaction, such as the post_delete
+    signals of one cascading delete, are collected into a single call.
+    Outside a transaction ``func`` runs immediately.
+    """
+    connection = transaction.get_connection()
+    batches = getattr(connection, 'commit_batches', None)
+    if batches is None:
+        batches = connection.commit_batches = {}
+    batch = batches.get(func)
+    # A batch that already ran or was rolled back is no longer queued
+    if batch is not None and any(batch in entry for entry in connection.run_on_commit):
+        batch.values.update(values)
+        return
+    batch = batches[func] = _CommitBatch(func)
+    batch.values.update(values)
+    transaction.on_commit(batch)
+
+
+def invalidate_curriculum(sender, **kwargs):
+    """Drop cached curriculum once the transaction changing a curriculum row commits"""
+    # Bumped any earlier, a request reading before the commit would cache the
+    # old rows under the new version, where they would never be replaced
+    transaction.on_commit(curriculum.invalidate)
+
+
+def index_for_search(sender, instance, **kwargs):
+    """Keep the search index in step with curriculum edits once they commit"""
+    if sender in search.KIND_MODELS.values():
+        transaction.on_commit(lambda: search.index_instance(instance))
+    else:
+        transaction.on_commit(lambda: search.reindex_children(instance))
+
+
+def remove_from_search(sender, instance, **kwargs):
+    # The deleted instance loses its primary key before the commit
+    kind, pk = search.kind_for(instance), instance.pk
+    transaction.on_commit(lambda: search.get_backend().remove(kind, pk))
+
+
+def _activity_item(instance):
+    """The cached module, quiz or drill an activity row belongs to"""
+    if isinstance(instance, ModuleProgress):
+        return curriculum.get_module(instance.module_id)
+    if isinstance(instance, QuizAttempt):
+        return curriculum.get_quiz(instance.quiz_id)
+    return curriculum.get_drill(instance.drill_checklist_id)
+
+
+def refresh_progress(sender, instance, **kwargs):
+    """Recompute the owner's rollups and the analytics of the disaster type once a deleted activity row commits"""
+    if sender is ModuleProgress and not instance.completed:
+        return
+    batch_on_commit(rebuild_rollups, [instance.user_id])
+    # In a cascade the item is deleted after its activity rows, so it can still be loaded here
+    item = _activity_item(instance)
+    if item is not None:
+        batch_on_commit(rebuild_analytics, [item.disaster_type_id])
+
+
+def connect_signals():
+    for model in curriculum.CURRICULUM_MODELS:
+        post_save.connect(invalidate_curriculum, sender=model, dispatch_uid=f'curriculum_save_{model.__name__}')
+        post_delete.connect(invalidate_curriculum, sender=model, dispatch_uid=f'curriculum_delete_{model.__name__}')
+    # Connected after the curriculum handlers, so on commit the index runs after the version bump
+    for model in [*search.KIND_MODELS.values(), DisasterType, Quiz, DrillChecklist]:
+        post_save.connect(index_for_search, sender=model, dispatch_uid=f'search_save_{model.__name__}')
+    for model in search.KIND_MODELS.values():
+        post_delete.connect(remove_from_search, sender=model, dispatch_uid=f'search_delete_{model.__name__}')
+    # Views count new activity themselves; deletes, including cascades from curriculum edits, are recounted here
+    for model in [ModuleProgress, QuizAttempt, DrillCompletion]:
+        post_delete.connect(refresh_progress, sender=model, dispatch_uid=f'progress_delete_{model.__name__}')
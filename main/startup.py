@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import pkgutil
+import time
+from contextlib import contextmanager
+from importlib import import_module
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+
+logger = logging.getLogger(__name__)
+
+SEED_NAME = 'populate_data'
+SEED_SOURCE = Path(__file__).resolve().parent / 'management' / 'commands' / 'populate_data.py'
+
+
+class BootTimer:
+    """Wall time of each named startup phase"""
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self):
+        total = sum(seconds for _, seconds in self.phases)
+        breakdown = ', '.join(f'{name} {seconds * 1000:.1f}ms' for name, seconds in self.phases)
+        logger.info('Startup finished in %.1fms (%s)', total * 1000, breakdown)
+
+
+def migration_files():
+    """(app_label, name) of every migration on disk, found without importing the migrations"""
+    found = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            module = import_module(module_name)
+        except ImportError:
+            continue
+        for info in pkgutil.iter_modules(getattr(module, '__path__', [])):
+            if not info.ispkg and info.name[0] not in '_~':
+                found.add((app_config.label, info.name))
+    return found
+
+
+def migration_fingerprint():
+    """Hash of the migrations on disk, logged so deploys can be compared"""
+    names = ''.join(f'{label}.{name}\n' for label, name in sorted(migration_files()))
+    return hashlib.sha256(names.encode()).hexdigest()
+
+
+def pending_migrations():
+    """Migrations on disk that the database has not recorded as applied; one query"""
+    recorder = MigrationRecorder(connection)
+    if not recorder.has_table():
+        return sorted(migration_files())
+    return sorted(migration_files() - set(recorder.applied_migrations()))
+
+
+def seed_fingerprint():
+    """Hash of the seed command's source; editing the seed content changes it"""
+    return hashlib.sha256(SEED_SOURCE.read_bytes()).hexdigest()
+
+
+def ensure_superuser():
+    from django.contrib.auth.models import User
+    if not User.objects.filter(username='admin').exists():
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+        logger.info('Created superuser: admin/admin123')
+
+
+def boot(timer=None, full=False):
+    """
+    Bring the database up to date before serving.
+
+    Migrations run only when some migration on disk is unapplied, and the
+    seed data is applied only when its fingerprint differs from the one
+    recorded by the last successful seed, so a warm start costs a handful
+    of queries. ``full`` forces both steps.
+    """
+    from .models import SeedRecord
+
+    timer = timer or BootTimer()
+
+    with timer.phase('migrations'):
+        pending = pending_migrations()
+        logger.info('Migration fingerprint %s, %d pending', migration_fingerprint()[:12], len(pending))
+        if full or pending:
+            call_command('migrate', interactive=False, verbosity=1 if pending else 0)
+
+    with timer.phase('seed'):
+        fingerprint = seed_fingerprint()
+        record = SeedRecord.objects.filter(name=SEED_NAME).first()
+        if full or pending or record is None or record.fingerprint != fingerprint:
+            ensure_superuser()
+            try:
+                call_command('populate_data')
+            except Exception as e:
+                logger.warning('Data population status: %s', e)
+            else:
+                SeedRecord.objects.update_or_create(name=SEED_NAME, defaults={'fingerprint': fingerprint})
+                logger.info('Seed data applied (%s)', fingerprint[:12])
+        else:
+            logger.info('Seed data up to date (%s); skipping populate_data', fingerprint[:12])
+
+    timer.report()
+    return timer
@@ -0,0 +1,199 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import (
+    EducationModule, Quiz, DrillChecklist,
+    UserProfile, ModuleProgress, QuizAttempt, DrillCompletion, UserDisasterProgress
+)
+
+GRADE_LEVELS = [str(grade) for grade in range(6, 13)]
+USER_TYPES = [('student', 0.95), ('teacher', 0.04), ('admin', 0.01)]
+
+
+@contextmanager
+def explicit_timestamps():
+    """Let bulk_create keep the generated completed_at values instead of now()"""
+    fields = [QuizAttempt._meta.get_field('completed_at'), DrillCompletion._meta.get_field('completed_at')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def load_curriculum():
+    """Curriculum ids and sizes the generator draws from"""
+    modules = {}
+    for module_id, disaster_type_id in EducationModule.objects.order_by('order').values_list(
+        'id', 'disaster_type_id'
+    ):
+        modules.setdefault(disaster_type_id, []).append(module_id)
+    quizzes = list(
+        Quiz.objects.annotate(size=Count('questions')).filter(size__gt=0).values_list('id', 'disaster_type_id', 'size')
+    )
+    drills = list(
+        DrillChecklist.objects.annotate(size=Count('steps')).filter(size__gt=0).values_list('id', 'disaster_type_id', 'size')
+    )
+    return {'modules': modules, 'quizzes': quizzes, 'drills': drills}
+
+
+def binomial(rng, n, p):
+    return sum(rng.random() < p for _ in range(n))
+
+
+def generate_users(start, count, prefix, seed, curriculum=None, institutions=50, days=180):
+    """
+    Create ``count`` synthetic users with realistic activity in one transaction.
+
+    Each user gets an engagement level that drives how many modules they
+    finish and how often they retry quizzes and drills, and a skill level
+    that drives their scores. Institutions follow a Zipf-like distribution so
+    a few large schools dominate. Rollup rows are written from the generated
+    values directly. Returns a dict of row counts.
+    """
+    rng = random.Random(seed * 1_000_003 + start)
+    curriculum = curriculum or load_curriculum()
+    now = timezone.now()
+    institution_weights = [1 / (rank + 1) for rank in range(institutions)]
+
+    with transaction.atomic(), explicit_timestamps():
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}-{start + i}', password='!', date_joined=now - timedelta(days=rng.uniform(0, days)))
+            for i in range(count)
+        ])
+
+        profiles, progress, attempts, completions, rollups = [], [], [], [], []
+        for user in users:
+            user_type = rng.choices([kind for kind, _ in USER_TYPES], [weight for _, weight in USER_TYPES])[0]
+            profiles.append(UserProfile(
+                user=user,
+                user_type=user_type,
+                institution=f'Institution {rng.choices(range(institutions), institution_weights)[0] + 1}',
+                grade_level=rng.choice(GRADE_LEVELS) if user_type == 'student' else '',
+            ))
+
+            engagement = rng.betavariate(2, 3)
+            skill = rng.betavariate(5, 3)
+            user_rollups = {}
+
+            def rollup_for(disaster_type_id):
+                if disaster_type_id not in user_rollups:
+                    user_rollups[disaster_type_id] = UserDisasterProgress(user=user, disaster_type_id=disaster_type_id)
+                return user_rollups[disaster_type_id]
+
+            for disaster_type_id, module_ids in curriculum['modules'].items():
+                # Later modules are finished by fewer users
+                for position, module_id in enumerate(module_ids):
+                    if rng.random() < engagement * 0.85 ** position:
+                        progress.append(ModuleProgress(
+                            user=user, module_id=module_id, completed=True,
+                            completion_date=now - timedelta(days=rng.uniform(0, days)),
+                            time_spent=int(rng.lognormvariate(6, 0.6)),
+                        ))
+                        rollup_for(disaster_type_id).modules_completed += 1
+
+            for quiz_id, disaster_type_id, size in curriculum['quizzes']:
+                tries = min(int(rng.expovariate(1 / (engagement * 3))) if engagement > 0 else 0, 20)
+                when = sorted(now - timedelta(days=rng.uniform(0, days)) for _ in range(tries))
+                for attempt_number, completed_at in enumerate(when):
+                    # Scores improve a little with each retry
+                    correct = binomial(rng, size, min(0.98, skill + 0.03 * attempt_number))
+                    score = correct / size * 100
+                    attempts.append(QuizAttempt(
+                        user=user, quiz_id=quiz_id, score=score, total_questions=size,
+                        correct_answers=correct, completed_at=completed_at,
+                        time_taken=int(rng.lognormvariate(5, 0.5)),
+                    ))
+                    rollup = rollup_for(disaster_type_id)
+                    rollup.quiz_attempts += 1
+                    rollup.quiz_score_sum += score
+                    rollup.best_quiz_score = max(rollup.best_quiz_score, score)
+                    rollup.last_quiz_score = score
+
+            for drill_id, disaster_type_id, size in curriculum['drills']:
+                tries = min(int(rng.expovariate(1 / (engagement * 2))) if engagement > 0 else 0, 10)
+                when = sorted(now - timedelta(days=rng.uniform(0, days)) for _ in range(tries))
+                for completed_at in when:
+                    done = binomial(rng, size, min(0.99, skill + 0.1))
+                    percentage = done / size * 100
+                    completions.append(DrillCompletion(
+                        user=user, drill_checklist_id=drill_id, completed_steps=done, total_steps=size,
+                        completion_percentage=percentage, completed_at=completed_at,
+                        time_taken=int(rng.lognormvariate(5.5, 0.5)),
+                    ))
+                    rollup = rollup_for(disaster_type_id)
+                    rollup.drill_completions += 1
+                    rollup.drill_score_sum += percentage
+                    rollup.best_drill_score = max(rollup.best_drill_score, percentage)
+                    rollup.last_drill_score = percentage
+
+            rollups.extend(user_rollups.values())
+
+        UserProfile.objects.bulk_create(profiles)
+        ModuleProgress.objects.bulk_create(progress, batch_size=2000)
+        QuizAttempt.objects.bulk_create(attempts, batch_size=2000)
+        DrillCompletion.objects.bulk_create(completions, batch_size=2000)
+        UserDisasterProgress.objects.bulk_create(rollups, batch_size=2000)
+
+    return {
+        'users': len(users),
+        'module_progress': len(progress),
+        'quiz_attempts': len(attempts),
+        'drill_completions': len(completions),
+    }
+
+
+def _generate_chunk(args):
+    """Process-pool entry point; each worker opens its own DB connection"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    return generate_users(*args)
+
+
+def generate(total_users, prefix, seed=1, chunk_size=1000, workers=1, institutions=50, days=180, progress=None):
+    """
+    Generate ``total_users`` synthetic users in chunks, optionally across processes.
+
+    Every chunk is its own transaction and is seeded independently, so the
+    output does not depend on how chunks are spread over workers.
+    ``progress`` is called with each chunk's counts as it completes.
+    """
+    curriculum = load_curriculum()
+    chunks = [
+        (start, min(chunk_size, total_users - start), prefix, seed, curriculum, institutions, days)
+        for start in range(0, total_users, chunk_size)
+    ]
+    totals = {'users': 0, 'module_progress': 0, 'quiz_attempts': 0, 'drill_completions': 0}
+
+    def add(counts):
+        for key, value in counts.items():
+            totals[key] += value
+        if progress:
+            progress(counts)
+
+    if workers <= 1:
+        for chunk in chunks:
+            add(generate_users(*chunk))
+        return totals
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from django.db import connections
+
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as pool:
+        for counts in pool.map(_generate_chunk, chunks):
+            add(counts)
+    return totals
@@ -0,0 +1,840 @@
+import io
+import json
+import os
+import runpy
+import tempfile
+import time
+import unittest
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.conf import settings
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import admin_tools, curriculum, fragments, search, write_buffer
+from .analytics import rebuild_analytics
+from .content_bundle import BundleError, BundleImporter, export_records
+from .grading import grade_answers, grade_csv
+from .progress import find_rollup_mismatches, rebuild_rollups
+from .admin_tools import EstimatedCountPaginator
+from .history import HISTORY_SOURCES
+from .query_inspector import inspect_queries, sql_shape
+from .models import (
+    DisasterType, EducationModule, Quiz, QuizQuestion, DrillChecklist, DrillStep, UserProfile,
+    ModuleProgress, QuizAttempt, DrillCompletion, DisasterAnalytics, UserDisasterProgress
+)
+
+
+def create_disaster_types(count, prefix='Test disaster'):
+    """Disaster types with three modules, a three-question quiz and a three-step drill each"""
+    disaster_types = []
+    for i in range(count):
+        disaster_type = DisasterType.objects.create(name=f'{prefix} {i}', description='Synthetic disaster type')
+        for order in range(1, 4):
+            EducationModule.objects.create(
+                disaster_type=disaster_type, title=f'Module {order}', content='<p>Content</p>', order=order
+            )
+        quiz = Quiz.objects.create(disaster_type=disaster_type, title='Quiz')
+        for order in range(1, 4):
+            QuizQuestion.objects.create(
+                quiz=quiz, question_text=f'Question {order}', option_a='A', option_b='B',
+                option_c='C', option_d='D', correct_answer='A', order=order
+            )
+        drill = DrillChecklist.objects.create(disaster_type=disaster_type, title='Drill')
+        for order in range(1, 4):
+            DrillStep.objects.create(drill_checklist=drill, step_text=f'Step {order}', order=order)
+        disaster_types.append(disaster_type)
+    return disaster_types
+
+
+def create_history(users, disaster_types):
+    """Give every user an attempt, completion and progress row per disaster type"""
+    now = timezone.now()
+    attempts, completions, progress = [], [], []
+    for user in users:
+        for disaster_type in disaster_types:
+            attempts.append(QuizAttempt(
+                user=user, quiz=disaster_type.quizzes.first(), score=50,
+                total_questions=3, correct_answers=1, time_taken=30
+            ))
+            completions.append(DrillCompletion(
+                user=user, drill_checklist=disaster_type.drill_checklists.first(), completed_steps=2,
+                total_steps=3, completion_percentage=66.7, time_taken=30
+            ))
+            progress.append(ModuleProgress(
+                user=user, module=disaster_type.modules.order_by('order').first(), completed=True, completion_date=now
+            ))
+    QuizAttempt.objects.bulk_create(attempts)
+    DrillCompletion.objects.bulk_create(completions)
+    ModuleProgress.objects.bulk_create(progress)
+    rebuild_rollups()
+
+
+class CurriculumTestCase(TestCase):
+    """
+    Test case starting from an empty curriculum cache.
+
+    The cache outlives each test's rolled-back transaction, so entries built
+    from one test's rows must not be served to the next.
+    """
+
+    def setUp(self):
+        curriculum.get_cache().clear()
+
+    def steady_state_queries(self, client, url):
+        """Queries of a repeated request, once the first has warmed the curriculum cache"""
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+
+class DashboardProgressQueryTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.disaster_types = create_disaster_types(5)
+        cls.user = User.objects.create_user('learner')
+        UserProfile.objects.create(user=cls.user, user_type='student')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_dashboard_query_count(self):
+        url = reverse('dashboard')
+        self.client.get(url)
+        # Session, user, disaster progress rollup, profile, recent modules, recent quizzes
+        with self.assertNumQueries(6):
+            self.client.get(url)
+
+    def test_get_progress_query_count(self):
+        url = reverse('get_progress', args=[self.disaster_types[0].id])
+        self.client.get(url)
+        # Session, user, disaster progress rollup
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_dashboard_queries_do_not_grow_with_disaster_types(self):
+        url = reverse('dashboard')
+        before = self.steady_state_queries(self.client, url)
+        create_disaster_types(15, prefix='More disaster')
+        curriculum.get_cache().clear()
+        self.assertEqual(self.steady_state_queries(self.client, url), before)
+
+
+class CompleteModuleTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.disaster_type = create_disaster_types(1)[0]
+        cls.module = cls.disaster_type.modules.order_by('order').first()
+        cls.user = User.objects.create_user('learner')
+        UserProfile.objects.create(user=cls.user, user_type='student')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse('complete_module', args=[self.module.id])
+
+    def assertCountedOnce(self):
+        rollup = UserDisasterProgress.objects.get(user=self.user, disaster_type=self.disaster_type)
+        self.assertEqual(rollup.modules_completed, 1)
+        analytics = DisasterAnalytics.objects.get(disaster_type=self.disaster_type)
+        self.assertEqual(analytics.modules_completed, 1)
+
+    def test_repeated_completion_counts_once(self):
+        self.client.post(self.url, {'time_spent': 60})
+        self.client.post(self.url, {'time_spent': 60})
+        self.assertTrue(ModuleProgress.objects.get(user=self.user, module=self.module).completed)
+        self.assertCountedOnce()
+
+    def test_concurrent_completion_counts_once(self):
+        self.client.post(self.url, {'time_spent': 60})
+        # A second request that read the row before the first one marked it
+        stale = ModuleProgress.objects.get(user=self.user, module=self.module)
+        stale.completed = False
+        with mock.patch.object(ModuleProgress.objects, 'get_or_create', return_value=(stale, False)):
+            self.client.post(self.url, {'time_spent': 60})
+        self.assertCountedOnce()
+
+
+class RollupDeleteTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.disaster_types = create_disaster_types(2)
+        cls.users = [User.objects.create_user(f'rollup-learner-{i}') for i in range(2)]
+        create_history(cls.users, cls.disaster_types)
+
+    def test_migration_backfills_existing_history(self):
+        migration = import_module('main.migrations.0002_userdisasterprogress')
+        UserDisasterProgress.objects.all().delete()
+        migration.backfill_rollups(apps, None)
+        self.assertEqual(UserDisasterProgress.objects.count(), 4)
+        self.assertEqual(find_rollup_mismatches(), [])
+
+    def test_deleting_an_attempt_recounts_the_rollup(self):
+        user, disaster_type = self.users[0], self.disaster_types[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            QuizAttempt.objects.filter(user=user, quiz__disaster_type=disaster_type).delete()
+        rollup = UserDisasterProgress.objects.get(user=user, disaster_type=disaster_type)
+        self.assertEqual(rollup.quiz_attempts, 0)
+        self.assertEqual(find_rollup_mismatches(), [])
+
+    def test_cascading_curriculum_delete_recounts_once_per_transaction(self):
+        with mock.patch('main.signals.rebuild_rollups') as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                Quiz.objects.filter(disaster_type=self.disaster_types[0]).delete()
+        rebuild.assert_called_once_with(sorted(user.id for user in self.users))
+
+    def test_cascading_curriculum_delete_keeps_rollups_consistent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            EducationModule.objects.filter(disaster_type=self.disaster_types[0]).delete()
+            DrillChecklist.objects.filter(disaster_type=self.disaster_types[1]).delete()
+        self.assertEqual(find_rollup_mismatches(), [])
+
+
+def analytics_snapshots():
+    return sorted(DisasterAnalytics.objects.values_list(
+        'disaster_type_id', 'institution', 'grade_level', 'modules_completed',
+        'quiz_attempts', 'quiz_score_sum', 'drill_completions', 'drill_score_sum',
+    ))
+
+
+class AnalyticsDeleteTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.disaster_types = create_disaster_types(2)
+        users = [User.objects.create_user(f'analytics-learner-{i}') for i in range(2)]
+        UserProfile.objects.create(user=users[0], user_type='student', institution='North High', grade_level='9')
+        create_history(users, cls.disaster_types)
+        rebuild_analytics()
+
+    def assertAnalyticsMatchHistory(self):
+        stored = analytics_snapshots()
+        rebuild_analytics()
+        self.assertEqual(stored, analytics_snapshots())
+
+    def test_migration_backfills_existing_history(self):
+        migration = import_module('main.migrations.0003_disasteranalytics')
+        DisasterAnalytics.objects.all().delete()
+        migration.backfill_analytics(apps, None)
+        self.assertEqual(DisasterAnalytics.objects.count(), 4)
+        self.assertAnalyticsMatchHistory()
+
+    def test_deleting_activity_recounts_its_disaster_type(self):
+        disaster_type = self.disaster_types[0]
+        with mock.patch('main.signals.rebuild_analytics', wraps=rebuild_analytics) as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                QuizAttempt.objects.filter(quiz__disaster_type=disaster_type).delete()
+                ModuleProgress.objects.filter(module__disaster_type=disaster_type).delete()
+        rebuild.assert_called_once_with([disaster_type.id])
+        analytics = DisasterAnalytics.objects.filter(disaster_type=disaster_type)
+        self.assertEqual(sum(analytics.values_list('quiz_attempts', flat=True)), 0)
+        self.assertEqual(sum(analytics.values_list('modules_completed', flat=True)), 0)
+        self.assertAnalyticsMatchHistory()
+
+    def test_cascading_curriculum_delete_keeps_analytics_consistent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            DrillChecklist.objects.filter(disaster_type=self.disaster_types[1]).delete()
+        self.assertAnalyticsMatchHistory()
+
+
+class GradingTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.disaster_type = create_disaster_types(1)[0]
+        cls.quiz = cls.disaster_type.quizzes.first()
+        cls.questions = list(cls.quiz.questions.order_by('order'))
+        cls.questions[1].correct_answer = 'C'
+        cls.questions[1].save()
+        cls.user = User.objects.create_user('grading-learner')
+        UserProfile.objects.create(user=cls.user, user_type='student')
+
+    def test_submission_is_graded_stored_and_counted(self):
+        self.client.force_login(self.user)
+        answers = {f'question_{question.id}': answer for question, answer in zip(self.questions, ['a', 'C', 'B'])}
+        self.client.post(reverse('submit_quiz', args=[self.quiz.id]), {**answers, 'time_taken': 42})
+
+        attempt = QuizAttempt.objects.get(user=self.user, quiz=self.quiz)
+        self.assertAlmostEqual(attempt.score, 200 / 3)
+        self.assertEqual((attempt.correct_answers, attempt.total_questions, attempt.time_taken), (2, 3, 42))
+        rollup = UserDisasterProgress.objects.get(user=self.user, disaster_type=self.disaster_type)
+        self.assertEqual(rollup.quiz_attempts, 1)
+        self.assertAlmostEqual(rollup.best_quiz_score, 200 / 3)
+        self.assertAlmostEqual(rollup.last_quiz_score, 200 / 3)
+
+    def test_missing_answers_count_as_wrong(self):
+        answer_key = curriculum.get_answer_key(self.quiz.id)
+        result = grade_answers(answer_key, ['A', None])
+        self.assertEqual(result['results'], [True, False, False])
+        self.assertAlmostEqual(result['score'], 100 / 3)
+
+    def test_csv_columns_by_order_or_field_name(self):
+        sheet = io.StringIO(f'username,1,question_{self.questions[1].id},3\nana,A,c,\n')
+        [(student, result)] = grade_csv(self.quiz.id, sheet)
+        self.assertEqual(student, 'ana')
+        self.assertEqual(result['results'], [True, True, False])
+
+
+@override_settings(ATTEMPT_WRITE_MODE='buffered')
+class BufferedWriteTests(TransactionTestCase):
+    """ATTEMPT_WRITE_MODE=buffered, with flushes on their own threads and connections"""
+
+    def setUp(self):
+        curriculum.get_cache().clear()
+        self.disaster_type = create_disaster_types(1)[0]
+        self.quiz = self.disaster_type.quizzes.first()
+        self.user = User.objects.create_user('buffered-learner')
+        self.client.force_login(self.user)
+
+    def use_buffer(self, **kwargs):
+        buffer = write_buffer.AttemptBuffer(**kwargs)
+        patcher = mock.patch.object(write_buffer, '_buffer', buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(buffer.flush)
+        return buffer
+
+    def submit(self, times=1):
+        answer = {f'question_{question.id}': 'A' for question in self.quiz.questions.all()}
+        for _ in range(times):
+            self.client.post(reverse('submit_quiz', args=[self.quiz.id]), answer)
+
+    def test_full_batch_is_flushed(self):
+        buffer = self.use_buffer(max_size=3, interval=60)
+        self.submit(2)
+        self.assertEqual(QuizAttempt.objects.count(), 0)
+        self.submit()
+        self.assertEqual(QuizAttempt.objects.count(), 3)
+        self.assertEqual(len(buffer), 0)
+        self.assertIsNone(buffer._timer)
+
+    def test_partial_batch_is_flushed_after_interval(self):
+        buffer = self.use_buffer(max_size=100, interval=0.05)
+        self.submit()
+        self.assertEqual(QuizAttempt.objects.count(), 0)
+        buffer._timer.join(5)
+        self.assertEqual(QuizAttempt.objects.count(), 1)
+        self.assertEqual(len(buffer), 0)
+
+    def test_worker_exit_hook_flushes(self):
+        self.use_buffer(max_size=100, interval=60)
+        self.submit(2)
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '1'}):
+            config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+        config['worker_exit'](server=None, worker=None)
+        self.assertEqual(QuizAttempt.objects.count(), 2)
+
+    def test_rollups_match_history_after_flush(self):
+        self.use_buffer(max_size=4, interval=60)
+        self.submit(5)
+        write_buffer.flush_attempts()
+        self.assertEqual(QuizAttempt.objects.count(), 5)
+        self.assertEqual(find_rollup_mismatches(), [])
+        analytics = DisasterAnalytics.objects.get(disaster_type=self.disaster_type)
+        self.assertEqual(analytics.quiz_attempts, 5)
+
+
+class ContentImportPruneTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.disaster_types = create_disaster_types(2)
+        users = [User.objects.create_user(f'import-learner-{i}') for i in range(3)]
+        create_history(users, cls.disaster_types)
+        rebuild_analytics()
+
+    def renamed_quiz_bundle(self):
+        records = list(export_records())
+        records[0]['disaster_type']['quizzes'][0]['title'] = 'Renamed quiz'
+        return records
+
+    def test_prune_refuses_to_delete_attempts(self):
+        importer = BundleImporter(prune=True)
+        with self.assertRaisesMessage(BundleError, '3 quiz attempts'):
+            importer.run(self.renamed_quiz_bundle())
+        self.assertEqual(QuizAttempt.objects.count(), 6)
+        self.assertFalse(Quiz.objects.filter(title='Renamed quiz').exists())
+
+    def test_prune_with_delete_history_rebuilds_rollups_and_analytics(self):
+        importer = BundleImporter(prune=True, delete_history=True)
+        with mock.patch('main.content_bundle.rebuild_rollups', wraps=rebuild_rollups) as rebuild:
+            importer.run(self.renamed_quiz_bundle())
+        rebuild.assert_called_once_with()
+        self.assertEqual(importer.stats['quiz']['deleted'], 1)
+        self.assertEqual(importer.stats['quizquestion']['deleted'], 3)
+        self.assertEqual(importer.cascaded, {'main.QuizAttempt': 3})
+        self.assertEqual(find_rollup_mismatches(), [])
+        stored = analytics_snapshots()
+        rebuild_analytics()
+        self.assertEqual(stored, analytics_snapshots())
+
+    def test_command_reports_cascaded_rows(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'bundle.json')
+        with open(path, 'w') as f:
+            json.dump({
+                'format': 'disaster-prep-curriculum', 'version': 1,
+                'disaster_types': [record['disaster_type'] for record in self.renamed_quiz_bundle()],
+            }, f)
+        with self.assertRaisesMessage(CommandError, '--delete-history'):
+            call_command('import_content', path, '--prune', '--local-cache', stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('import_content', path, '--prune', '--delete-history', '--dry-run', stdout=out)
+        self.assertIn('main.QuizAttempt', out.getvalue())
+        self.assertIn('3 deleted by cascade', out.getvalue())
+        self.assertEqual(QuizAttempt.objects.count(), 6)
+
+
+class CurriculumCacheTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.module = create_disaster_types(1)[0].modules.order_by('order').first()
+
+    def test_edit_invalidates_after_commit(self):
+        cached = curriculum.get_module(self.module.id)
+        version = curriculum.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.module.title = 'Edited module'
+            self.module.save()
+            # Until the edit commits, other connections still read the old row
+            self.assertEqual(curriculum.get_version(), version)
+            self.assertEqual(curriculum.get_module(self.module.id).title, cached.title)
+        self.assertNotEqual(curriculum.get_version(), version)
+        self.assertEqual(curriculum.get_module(self.module.id).title, 'Edited module')
+
+    @override_settings(CURRICULUM_CACHE_TIMEOUT=60)
+    def test_process_local_cache_expires_edits_made_elsewhere(self):
+        self.assertTrue(curriculum.cache_is_process_local())
+        version = curriculum.get_version()
+        curriculum.get_module(self.module.id)
+        # Another process edits the module; its version bump never reaches this cache
+        EducationModule.objects.filter(id=self.module.id).update(title='Edited elsewhere')
+        self.assertNotEqual(curriculum.get_module(self.module.id).title, 'Edited elsewhere')
+
+        later = time.time() + 61
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            self.assertEqual(curriculum.get_module(self.module.id).title, 'Edited elsewhere')
+            # The version expired too, so page ETags built from it change as well
+            self.assertNotEqual(curriculum.get_version(), version)
+
+
+class FragmentCacheTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.module = create_disaster_types(1)[0].modules.order_by('order').first()
+
+    def test_template_change_renders_a_new_fragment(self):
+        with mock.patch.object(fragments, '_render', wraps=fragments._render) as render:
+            fragments.render_module_content(self.module)
+            fragments.render_module_content(self.module)
+            self.assertEqual(render.call_count, 1)
+            with mock.patch.object(fragments, 'templates_fingerprint', return_value='edited templates'):
+                fragments.render_module_content(self.module)
+            self.assertEqual(render.call_count, 2)
+
+
+class SearchIndexTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.module = create_disaster_types(1)[0].modules.order_by('order').first()
+
+    def test_memory_index_follows_committed_edits(self):
+        backend = search.MemoryBackend()
+        with mock.patch.object(search, '_backend', backend):
+            backend.rebuild()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.module.title = 'Tsunami evacuation routes'
+                self.module.save()
+            # The index applied the edit itself, after the version bump, so it needs no rebuild
+            self.assertEqual(backend._version, curriculum.get_version())
+            with mock.patch.object(backend, '_rebuild') as rebuild:
+                results = search.search('tsunami')
+            rebuild.assert_not_called()
+        self.assertEqual([result['title'] for result in results], ['Tsunami evacuation routes'])
+
+
+class QueryBudgetTests(CurriculumTestCase):
+    """
+    Steady-state query counts of key pages stay within fixed budgets.
+
+    The budgets include session and user lookups done by middleware, and
+    hold no matter how many disaster types exist.
+    """
+
+    QUERY_BUDGETS = {
+        'home': 2,
+        'dashboard': 6,
+        'module_detail': 6,
+        'quiz_detail': 6,
+        'drill_checklist': 6,
+        'emergency_contacts': 4,
+        'admin_dashboard': 8,
+        'get_progress': 3,
+        'get_progress_batch': 6,
+        'get_analytics': 5,
+        'history': 4,
+        'history_api': 3,
+        'admin_quizattempt_changelist': 8,
+        'admin_quizattempt_search': 8,
+        'admin_drillcompletion_changelist': 8,
+        'admin_moduleprogress_changelist': 8,
+        'admin_userdisasterprogress_changelist': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        disaster_types = create_disaster_types(20)
+        cls.disaster_type = disaster_types[-1]
+        cls.teacher = User.objects.create_user('query-budget-teacher')
+        UserProfile.objects.create(user=cls.teacher, user_type='teacher')
+        cls.staff = User.objects.create_superuser('query-budget-admin')
+        learners = [User.objects.create_user(f'query-budget-learner-{i}') for i in range(3)]
+        create_history(learners, disaster_types)
+
+    def pages(self):
+        """(name, url, user to log in as or None for an anonymous request)"""
+        disaster_type, teacher, staff = self.disaster_type, self.teacher, self.staff
+        module = disaster_type.modules.order_by('order').first()
+        quiz = disaster_type.quizzes.first()
+        drill = disaster_type.drill_checklists.first()
+        return [
+            ('home', reverse('home'), None),
+            ('dashboard', reverse('dashboard'), teacher),
+            ('module_detail', reverse('module_detail', args=[module.id]), teacher),
+            ('quiz_detail', reverse('quiz_detail', args=[quiz.id]), teacher),
+            ('drill_checklist', reverse('drill_checklist', args=[drill.id]), teacher),
+            ('emergency_contacts', reverse('emergency_contacts'), teacher),
+            ('admin_dashboard', reverse('admin_dashboard'), teacher),
+            ('get_progress', reverse('get_progress', args=[disaster_type.id]), teacher),
+            ('get_progress_batch', reverse('get_progress_batch') + '?detail=modules,quizzes', teacher),
+            ('get_analytics', reverse('get_analytics'), teacher),
+            ('history', reverse('history', args=['quizzes']), teacher),
+            ('history_api', reverse('history_api', args=['drills']) + f'?item={drill.id}', teacher),
+            ('admin_quizattempt_changelist', reverse('admin:main_quizattempt_changelist'), staff),
+            ('admin_quizattempt_search', reverse('admin:main_quizattempt_changelist') + '?q=query-budget', staff),
+            ('admin_drillcompletion_changelist', reverse('admin:main_drillcompletion_changelist'), staff),
+            ('admin_moduleprogress_changelist', reverse('admin:main_moduleprogress_changelist'), staff),
+            ('admin_userdisasterprogress_changelist', reverse('admin:main_userdisasterprogress_changelist'), staff),
+        ]
+
+    def test_pages_stay_within_query_budgets(self):
+        for name, url, login_as in self.pages():
+            with self.subTest(page=name):
+                if login_as:
+                    self.client.force_login(login_as)
+                else:
+                    self.client.logout()
+                self.assertLessEqual(self.steady_state_queries(self.client, url), self.QUERY_BUDGETS[name])
+
+    @override_settings(QUERY_INSPECTOR_REPEATS=5, QUERY_INSPECTOR_SLOW_MS=float('inf'))
+    def test_pages_repeat_no_query_shape(self):
+        for name, url, login_as in self.pages():
+            with self.subTest(page=name):
+                if login_as:
+                    self.client.force_login(login_as)
+                else:
+                    self.client.logout()
+                self.client.get(url)
+                with inspect_queries() as log:
+                    self.client.get(url)
+                self.assertEqual(log.problems(), [])
+
+
+def hot_queries(user_id=1, quiz_id=1, drill_id=1):
+    """The per-user and admin lookups issued on every dashboard, quiz, drill and history view"""
+    now = timezone.now()
+    queries = {
+        'dashboard recent modules': ModuleProgress.objects.filter(
+            user_id=user_id, completed=True
+        ).order_by('-completion_date')[:5],
+        'dashboard recent quizzes': QuizAttempt.objects.filter(
+            user_id=user_id
+        ).order_by('-completed_at')[:5],
+        'dashboard progress rollup': UserDisasterProgress.objects.filter(user_id=user_id),
+        'quiz previous attempts': QuizAttempt.objects.filter(
+            user_id=user_id, quiz_id=quiz_id
+        ).order_by('-completed_at')[:5],
+        'drill previous completions': DrillCompletion.objects.filter(
+            user_id=user_id, drill_checklist_id=drill_id
+        ).order_by('-completed_at')[:5],
+        'admin recent module completions': ModuleProgress.objects.filter(
+            completed=True
+        ).order_by('-completion_date')[:10],
+        'admin recent quiz attempts': QuizAttempt.objects.order_by('-completed_at')[:10],
+        'quiz attempt changelist': QuizAttempt.objects.order_by('-completed_at', '-id')[:100],
+        'drill completion changelist': DrillCompletion.objects.order_by('-completed_at', '-id')[:100],
+    }
+    # Every history page after the first seeks past a (timestamp, id) cursor
+    for kind, source in HISTORY_SOURCES.items():
+        queries[f'{kind} history page'] = source.after(source.queryset(user_id), now, 1)[:21]
+        item_id = {'quizzes': quiz_id, 'drills': drill_id}.get(kind)
+        if item_id is not None:
+            queries[f'{kind} history page for one item'] = source.after(source.queryset(user_id, item_id), now, 1)[:21]
+    return queries
+
+
+def plan_problems(plan):
+    """Return the reasons a SQLite query plan is not a pure index lookup"""
+    problems = []
+    for line in plan.splitlines():
+        if 'SCAN' in line and 'INDEX' not in line:
+            problems.append(f'full table scan: {line.strip()}')
+        if 'TEMP B-TREE' in line:
+            problems.append(f'sort not served by an index: {line.strip()}')
+    return problems
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Plans are checked against the SQLite planner')
+class QueryPlanTests(TestCase):
+    """The hot progress, attempt and history queries are served by index scans"""
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in hot_queries().items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                self.assertEqual(plan_problems(plan), [], plan)
+
+    def test_admin_username_search_seeks_an_index(self):
+        plan = User.objects.filter(username__istartswith='al').values('id').explain()
+        # A scan of the unique username index would pass plan_problems but still read every user
+        self.assertIn('SEARCH', plan)
+
+
+class HttpCachingTests(CurriculumTestCase):
+    """ETag, Last-Modified, Cache-Control and 304 revalidation on the curriculum pages"""
+
+    CACHE_POLICIES = {
+        'home': 'public, max-age=60',
+        'module_detail': 'private, no-cache',
+        'quiz_detail': 'private, no-cache',
+        'drill_checklist': 'private, no-cache',
+        'emergency_contacts': 'private, max-age=300',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.disaster_type = create_disaster_types(1)[0]
+        cls.module = cls.disaster_type.modules.order_by('order').first()
+        cls.user = User.objects.create_user('http-caching')
+        UserProfile.objects.create(user=cls.user, user_type='student')
+
+    def login(self):
+        self.client.force_login(self.user)
+        # The first authenticated render sets the CSRF cookie that later ETags include
+        self.client.get(reverse('module_detail', args=[self.module.id]))
+
+    def assertRevalidates(self, name, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('ETag'))
+        self.assertEqual(first['Cache-Control'], self.CACHE_POLICIES[name])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        return first['ETag']
+
+    def test_home_revalidates(self):
+        self.assertRevalidates('home', reverse('home'))
+
+    def test_pages_revalidate(self):
+        self.login()
+        pages = [
+            ('module_detail', reverse('module_detail', args=[self.module.id])),
+            ('quiz_detail', reverse('quiz_detail', args=[self.disaster_type.quizzes.first().id])),
+            ('drill_checklist', reverse('drill_checklist', args=[self.disaster_type.drill_checklists.first().id])),
+            ('emergency_contacts', reverse('emergency_contacts')),
+        ]
+        for name, url in pages:
+            with self.subTest(page=name):
+                self.assertRevalidates(name, url)
+
+    def test_module_is_not_revalidated_by_date_alone(self):
+        self.login()
+        url = reverse('module_detail', args=[self.module.id])
+        self.assertFalse(self.client.get(url).has_header('Last-Modified'))
+        # Renaming the quiz listed on the page leaves the module's updated_at alone
+        Quiz.objects.filter(disaster_type=self.disaster_type).update(title='Renamed quiz')
+        curriculum.invalidate()
+        later = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=later).status_code, 200)
+
+    def test_progress_batch_revalidates(self):
+        self.login()
+        for query in ('', f'?disaster_types={self.disaster_type.id}&detail=modules,quizzes'):
+            with self.subTest(query=query):
+                url = reverse('get_progress_batch') + query
+                first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                self.assertEqual(first['Cache-Control'], 'private, no-cache')
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_recording_progress_changes_batch_etag(self):
+        self.login()
+        url = reverse('get_progress_batch')
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('complete_module', args=[self.module.id]), {'time_spent': 60})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_recording_progress_changes_etag(self):
+        self.login()
+        url = reverse('module_detail', args=[self.module.id])
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('complete_module', args=[self.module.id]), {'time_spent': 60})
+        flashed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        # A page carrying a flash message renders and is not stored
+        self.assertEqual(flashed.status_code, 200)
+        self.assertIn('no-store', flashed['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_editing_module_changes_etag(self):
+        self.login()
+        url = reverse('module_detail', args=[self.module.id])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.module.title = f'{self.module.title} (edited)'
+            self.module.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class HighVolumeAdminTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        disaster_types = create_disaster_types(2)
+        cls.disaster_type = disaster_types[0]
+        learners = [User.objects.create_user(username) for username in ('alice', 'albert', 'Alan', 'bob')]
+        create_history(learners, disaster_types)
+        cls.staff = User.objects.create_superuser('admin-tester')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff)
+        self.url = reverse('admin:main_quizattempt_changelist')
+
+    def changelist(self, query=''):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_search_matches_username_prefix_in_any_case(self):
+        users = {attempt.user.username for attempt in self.changelist('?q=AL').result_list}
+        self.assertEqual(users, {'alice', 'albert', 'Alan'})
+
+    def test_search_matches_item_title(self):
+        self.assertEqual(self.changelist('?q=quiz').result_count, 8)
+
+    def test_filtered_count_stops_at_cap(self):
+        with mock.patch.object(EstimatedCountPaginator, 'count_cap', 3):
+            cl = self.changelist(f'?quiz__disaster_type__id__exact={self.disaster_type.id}')
+        self.assertEqual(cl.result_count, 3)
+
+    def test_unfiltered_count_is_estimated_past_cap(self):
+        with mock.patch.object(EstimatedCountPaginator, 'count_cap', 3):
+            cl = self.changelist()
+        self.assertGreaterEqual(cl.result_count, QuizAttempt.objects.count())
+
+
+@override_settings(QUERY_INSPECTOR_REPEATS=3, QUERY_INSPECTOR_SLOW_MS=float('inf'))
+class QueryInspectorTests(TestCase):
+    def test_in_lists_of_any_length_share_a_shape(self):
+        self.assertEqual(
+            sql_shape('SELECT * FROM t WHERE id IN (%s, %s)'),
+            sql_shape('SELECT *  FROM t\nWHERE id IN (%s, %s, %s)'),
+        )
+
+    def test_repeated_shape_is_reported_with_its_origin(self):
+        with inspect_queries() as log:
+            for disaster_id in range(3):
+                DisasterType.objects.filter(id=disaster_id).first()
+        problems = log.problems()
+        self.assertEqual(len(problems), 1)
+        self.assertIn('N+1: 3 queries of one shape', problems[0])
+        self.assertIn('main/tests.py', problems[0])
+
+
+class ExportTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        disaster_types = create_disaster_types(2)
+        cls.teacher = User.objects.create_user('export-teacher')
+        UserProfile.objects.create(user=cls.teacher, user_type='teacher', institution='North High')
+        learners = [User.objects.create_user(f'export-learner-{i}') for i in range(3)]
+        for learner in learners:
+            UserProfile.objects.create(user=learner, user_type='student', institution='North High')
+        outsider = User.objects.create_user('export-outsider')
+        UserProfile.objects.create(user=outsider, user_type='student', institution='South High')
+        create_history([*learners, outsider], disaster_types)
+
+    def test_teacher_export_is_limited_to_their_institution(self):
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('export_activity', args=['quizzes']))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1 + 3 * 2)
+        self.assertNotIn('export-outsider', '\n'.join(lines))
+
+    def test_teacher_without_institution_is_refused(self):
+        teacher = User.objects.create_user('unaffiliated-teacher')
+        UserProfile.objects.create(user=teacher, user_type='teacher')
+        self.client.force_login(teacher)
+        self.assertEqual(self.client.get(reverse('export_activity', args=['quizzes'])).status_code, 403)
+
+    def test_admin_empty_filters_export_everyone(self):
+        admin = User.objects.create_user('export-admin')
+        UserProfile.objects.create(user=admin, user_type='admin')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('export_activity', args=['quizzes']) + '?institution=&grade_level=')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1 + 4 * 2)
+
+    async def test_asgi_export_streams_from_an_async_iterator(self):
+        client = AsyncClient()
+        await client.aforce_login(self.teacher)
+        url = reverse('export_activity', args=['drills']) + '?format=jsonl'
+        response = await client.get(url)
+        # Django would otherwise collect a sync iterator into a list before sending it
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(body.splitlines()), 3 * 2)
+
+
+class OrderedAdminActionTests(CurriculumTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.quizzes = [disaster_type.quizzes.first() for disaster_type in create_disaster_types(2)]
+        QuizQuestion.objects.update(order=F('order') * 10)
+        cls.staff = User.objects.create_superuser('ordering-admin')
+
+    def orders(self):
+        return list(QuizQuestion.objects.order_by('quiz', 'order').values_list('order', flat=True))
+
+    def renumber(self):
+        self.client.force_login(self.staff)
+        return self.client.post(reverse('admin:main_quiz_changelist'), {
+            'action': 'renumber_children',
+            '_selected_action': [quiz.id for quiz in self.quizzes],
+        })
+
+    def test_renumber_action_numbers_every_selected_quiz(self):
+        self.renumber()
+        self.assertEqual(self.orders(), [1, 2, 3, 1, 2, 3])
+
+    def test_renumber_action_is_one_transaction(self):
+        renumber = admin_tools.renumber_children
+        calls = []
+
+        def fail_on_second_quiz(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('renumbering failed')
+            return renumber(*args, **kwargs)
+
+        with mock.patch.object(admin_tools, 'renumber_children', fail_on_second_quiz):
+            with self.assertRaises(RuntimeError):
+                self.renumber()
+        self.assertEqual(self.orders(), [10, 20, 30, 10, 20, 30])
@@ -27,9 +27,24 @@ urlpatterns = [
     # Emergency contacts
     path('emergency-contacts/', views.emergency_contacts, name='emergency_contacts'),
     
+    # History
+    path('history/<str:kind>/', views.history, name='history'),
+    
+    # Search
+    path('search/', views.search_page, name='search'),
+    
     # Admin dashboard
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/export/<str:kind>/', views.export_activity, name='export_activity'),
     
     # API endpoints
+    path('api/progress/', views.get_progress_batch, name='get_progress_batch'),
     path('api/progress/<int:disaster_id>/', views.get_progress, name='get_progress'),
+    path('api/analytics/', views.get_analytics, name='get_analytics'),
+    path('api/history/<str:kind>/', views.history_api, name='history_api'),
+    path('api/search/', views.search_api, name='search_api'),
+    path('api/curriculum-cache/', views.curriculum_cache_stats, name='curriculum_cache_stats'),
+    
+    # Monitoring
+    path('metrics/', views.request_metrics, name='request_metrics'),
 ]
@@ -1,34 +1,78 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import login
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Avg, Count, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.db import transaction
+from django.db.models import Count, Max, Q
 from django.views.decorators.http import require_POST
-from django.core.paginator import Paginator
+import hashlib
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+from asgiref.sync import sync_to_async
 
 from .models import (
-    DisasterType, EducationModule, Quiz, QuizQuestion, DrillChecklist,
+    EducationModule, QuizQuestion, DrillChecklist,
     UserProfile, ModuleProgress, QuizAttempt, DrillCompletion, EmergencyContact
 )
+from . import curriculum, search
+from .analytics import get_user_counts, get_disaster_analytics, aget_analytics
+from .exports import EXPORT_FORMATS, EXPORT_KINDS, aiter_chunks, export_filename, export_rows, stream_export
+from .fragments import render_module_content
+from .grading import grade_submission
+from .history import (
+    HISTORY_PAGE_SIZE, HISTORY_SOURCES, get_history_page, aget_history_page,
+    attach_history_items, serialize_history_row
+)
+from .http_caching import conditional_page, user_parts
+from .metrics import registry as metrics_registry
+from .page_context import (
+    attach_disaster_summaries, attach_user_progress, attach_module_completion
+)
+from .progress import (
+    PROGRESS_DETAILS, get_user_progress, aget_user_progress, aget_progress_detail, aget_progress_stamp,
+    record_module_completion, record_quiz_attempt, record_drill_completion
+)
+from .write_buffer import save_attempt
+
+def _home_validators(request):
+    return ('authenticated' if request.user.is_authenticated else 'anonymous',), None
 
+def _module_validators(request, module_id):
+    # No Last-Modified: the page also shows the disaster's other modules and
+    # quiz, which change with the curriculum version and have no timestamp
+    if curriculum.get_module(module_id) is None:
+        return None
+    return (module_id, user_parts(request)), None
+
+def _quiz_validators(request, quiz_id):
+    return (quiz_id, user_parts(request)), None
+
+def _drill_validators(request, drill_id):
+    return (drill_id, user_parts(request)), None
+
+def _contacts_validators(request):
+    return (user_parts(request, progress=False),), None
+
+@conditional_page(_home_validators, public=True, max_age=60)
 def home(request):
     """Home page with overview of disaster types"""
     if request.user.is_authenticated:
         return redirect('dashboard')
     
-    disaster_types = DisasterType.objects.all()
-    total_modules = EducationModule.objects.count()
-    total_quizzes = Quiz.objects.count()
+    disaster_types = attach_disaster_summaries(curriculum.get_disaster_types())
+    totals = curriculum.get_curriculum_totals()
     
     context = {
         'disaster_types': disaster_types,
-        'total_modules': total_modules,
-        'total_quizzes': total_quizzes,
+        'total_modules': totals['modules'],
+        'total_quizzes': totals['quizzes'],
     }
     return render(request, 'home.html', context)
 
@@ -62,45 +106,19 @@ def register(request):
 @login_required
 def dashboard(request):
     """User dashboard showing progress and available content"""
-    disaster_types = DisasterType.objects.all()
-    user_progress = {}
-    
-    for disaster_type in disaster_types:
-        modules = disaster_type.modules.all()
-        completed_modules = ModuleProgress.objects.filter(
-            user=request.user,
-            module__disaster_type=disaster_type,
-            completed=True
-        ).count()
-        
-        quiz_attempts = QuizAttempt.objects.filter(
-            user=request.user,
-            quiz__disaster_type=disaster_type
-        )
-        
-        drill_completions = DrillCompletion.objects.filter(
-            user=request.user,
-            drill_checklist__disaster_type=disaster_type
-        )
-        
-        user_progress[disaster_type.id] = {
-            'modules_completed': completed_modules,
-            'total_modules': modules.count(),
-            'quiz_attempts': quiz_attempts.count(),
-            'avg_quiz_score': quiz_attempts.aggregate(Avg('score'))['score__avg'] or 0,
-            'drill_completions': drill_completions.count(),
-            'avg_drill_score': drill_completions.aggregate(Avg('completion_percentage'))['completion_percentage__avg'] or 0,
-        }
+    disaster_types = attach_disaster_summaries(curriculum.get_disaster_types())
+    user_progress = get_user_progress(request.user, disaster_types)
+    attach_user_progress(disaster_types, user_progress)
     
     # Recent activity
     recent_modules = ModuleProgress.objects.filter(
         user=request.user,
         completed=True
-    ).order_by('-completion_date')[:5]
+    ).select_related('module__disaster_type').order_by('-completion_date')[:5]
     
     recent_quizzes = QuizAttempt.objects.filter(
         user=request.user
-    ).order_by('-completed_at')[:5]
+    ).select_related('quiz__disaster_type').order_by('-completed_at')[:5]
     
     context = {
         'disaster_types': disaster_types,
@@ -111,9 +129,12 @@ def dashboard(request):
     return render(request, 'dashboard.html', context)
 
 @login_required
+@conditional_page(_module_validators, private=True, no_cache=True)
 def module_detail(request, module_id):
     """Display education module content"""
-    module = get_object_or_404(EducationModule, id=module_id)
+    module = curriculum.get_module(module_id)
+    if module is None:
+        raise Http404('No EducationModule matches the given query.')
     
     # Check if user has completed this module
     progress, created = ModuleProgress.objects.get_or_create(
@@ -123,15 +144,18 @@ def module_detail(request, module_id):
     )
     
     # Get other modules in the same disaster type
-    related_modules = EducationModule.objects.filter(
-        disaster_type=module.disaster_type
-    ).exclude(id=module_id).order_by('order')
+    related_modules = attach_module_completion(request.user, [
+        related for related in curriculum.get_disaster_modules(module.disaster_type_id)
+        if related.id != module.id
+    ])
+    attach_disaster_summaries([module.disaster_type])
     
     # Get available quiz for this disaster type
-    quiz = Quiz.objects.filter(disaster_type=module.disaster_type).first()
+    quiz = curriculum.get_disaster_quiz(module.disaster_type_id)
     
     context = {
         'module': module,
+        'module_html': render_module_content(module),
         'progress': progress,
         'related_modules': related_modules,
         'quiz': quiz,
@@ -150,26 +174,37 @@ def complete_module(request, module_id):
     )
     
     if not progress.completed:
-        progress.completed = True
-        progress.completion_date = timezone.now()
-        
         # Add time spent (from frontend)
         time_spent = request.POST.get('time_spent', 0)
         try:
-            progress.time_spent = int(time_spent)
+            time_spent = int(time_spent)
         except (ValueError, TypeError):
-            progress.time_spent = 0
+            time_spent = 0
         
-        progress.save()
-        messages.success(request, f'Module "{module.title}" completed!')
+        with transaction.atomic():
+            # Only the request that flips the row counts the completion, so a
+            # double submit cannot record the module twice in the rollups
+            marked = ModuleProgress.objects.filter(pk=progress.pk, completed=False).update(
+                completed=True,
+                completion_date=timezone.now(),
+                time_spent=time_spent,
+            )
+            if marked:
+                record_module_completion(request.user, module.disaster_type_id)
+        if marked:
+            messages.success(request, f'Module "{module.title}" completed!')
     
     return redirect('module_detail', module_id=module_id)
 
 @login_required
+@conditional_page(_quiz_validators, private=True, no_cache=True)
 def quiz_detail(request, quiz_id):
     """Display quiz questions"""
-    quiz = get_object_or_404(Quiz, id=quiz_id)
-    questions = quiz.questions.all().order_by('order')
+    quiz = curriculum.get_quiz(quiz_id)
+    if quiz is None:
+        raise Http404('No Quiz matches the given query.')
+    questions = curriculum.get_quiz_questions(quiz_id)
+    attach_disaster_summaries([quiz.disaster_type])
     
     # Check previous attempts
     previous_attempts = QuizAttempt.objects.filter(
@@ -178,7 +213,7 @@ def quiz_detail(request, quiz_id):
     ).order_by('-completed_at')
     
     best_score = previous_attempts.aggregate(
-        best=models.Max('score')
+        best=Max('score')
     )['best'] or 0
     
     context = {
@@ -193,19 +228,15 @@ def quiz_detail(request, quiz_id):
 @require_POST
 def submit_quiz(request, quiz_id):
     """Process quiz submission"""
-    quiz = get_object_or_404(Quiz, id=quiz_id)
-    questions = quiz.questions.all()
+    quiz = curriculum.get_quiz(quiz_id)
+    if quiz is None:
+        raise Http404('No Quiz matches the given query.')
     
-    correct_answers = 0
-    total_questions = questions.count()
-    
-    # Calculate score
-    for question in questions:
-        user_answer = request.POST.get(f'question_{question.id}')
-        if user_answer and user_answer.upper() == question.correct_answer:
-            correct_answers += 1
-    
-    score = (correct_answers / total_questions * 100) if total_questions > 0 else 0
+    # Calculate score against the cached answer key
+    result = grade_submission(quiz_id, request.POST)
+    score = result['score']
+    correct_answers = result['correct_answers']
+    total_questions = result['total_questions']
     
     # Get time taken
     time_taken = request.POST.get('time_taken', 0)
@@ -215,7 +246,7 @@ def submit_quiz(request, quiz_id):
         time_taken = 0
     
     # Save quiz attempt
-    QuizAttempt.objects.create(
+    attempt = QuizAttempt(
         user=request.user,
         quiz=quiz,
         score=score,
@@ -223,15 +254,20 @@ def submit_quiz(request, quiz_id):
         correct_answers=correct_answers,
         time_taken=time_taken
     )
+    save_attempt(attempt, record_quiz_attempt, request.user, quiz.disaster_type_id, score)
     
     messages.success(request, f'Quiz completed! Score: {score:.1f}% ({correct_answers}/{total_questions})')
     return redirect('quiz_detail', quiz_id=quiz_id)
 
 @login_required
+@conditional_page(_drill_validators, private=True, no_cache=True)
 def drill_checklist(request, drill_id):
     """Display drill checklist"""
-    drill = get_object_or_404(DrillChecklist, id=drill_id)
-    steps = drill.steps.all().order_by('order')
+    drill = curriculum.get_drill(drill_id)
+    if drill is None:
+        raise Http404('No DrillChecklist matches the given query.')
+    steps = curriculum.get_drill_steps(drill_id)
+    attach_disaster_summaries([drill.disaster_type])
     
     # Get previous completions
     previous_completions = DrillCompletion.objects.filter(
@@ -240,7 +276,7 @@ def drill_checklist(request, drill_id):
     ).order_by('-completed_at')
     
     best_completion = previous_completions.aggregate(
-        best=models.Max('completion_percentage')
+        best=Max('completion_percentage')
     )['best'] or 0
     
     context = {
@@ -274,7 +310,7 @@ def complete_drill(request, drill_id):
         time_taken = 0
     
     # Save drill completion
-    DrillCompletion.objects.create(
+    completion = DrillCompletion(
         user=request.user,
         drill_checklist=drill,
         completed_steps=completed_steps,
@@ -282,11 +318,118 @@ def complete_drill(request, drill_id):
         completion_percentage=completion_percentage,
         time_taken=time_taken
     )
+    save_attempt(completion, record_drill_completion, request.user, drill.disaster_type_id, completion_percentage)
     
     messages.success(request, f'Drill completed! {completion_percentage:.1f}% ({completed_steps}/{total_steps} steps)')
     return redirect('drill_checklist', drill_id=drill_id)
 
+HISTORY_TITLES = {
+    'quizzes': 'Quiz attempts',
+    'drills': 'Drill completions',
+    'modules': 'Completed modules',
+}
+
+def _history_args(request, kind):
+    """Parse ?item= and ?limit= for a history kind; raises ValueError on bad input"""
+    if kind not in HISTORY_SOURCES:
+        raise Http404('Unknown history.')
+    item_id = request.GET.get('item')
+    try:
+        item_id = int(item_id) if item_id else None
+    except ValueError:
+        raise ValueError('item must be an integer.')
+    try:
+        limit = int(request.GET.get('limit', HISTORY_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer.')
+    return item_id, request.GET.get('cursor'), limit
+
+@login_required
+def history(request, kind):
+    """A user's quiz attempts, drill completions or completed modules, newest first"""
+    try:
+        item_id, cursor, limit = _history_args(request, kind)
+        rows, next_cursor = get_history_page(kind, request.user, item_id, cursor, limit)
+    except ValueError:
+        # A stale or hand-edited cursor starts again from the newest entry
+        return redirect('history', kind=kind)
+    attach_history_items(kind, rows)
+    
+    context = {
+        'kind': kind,
+        'title': HISTORY_TITLES[kind],
+        'kinds': HISTORY_TITLES,
+        'item_id': item_id,
+        'rows': rows,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'history.html', context)
+
+@login_required
+async def history_api(request, kind):
+    """API endpoint with one page of history; follow ``next_cursor`` via ?cursor= for older entries"""
+    try:
+        item_id, cursor, limit = _history_args(request, kind)
+        user = await request.auser()
+        rows, next_cursor = await aget_history_page(kind, user, item_id, cursor, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    def serialize():
+        return [serialize_history_row(kind, row) for row in attach_history_items(kind, rows)]
+    
+    return JsonResponse({
+        'kind': kind,
+        'results': await sync_to_async(serialize)(),
+        'next_cursor': next_cursor,
+    })
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_API_MAX_LIMIT = 50
+
+def _search_kinds(value):
+    kinds = [kind.strip() for kind in (value or '').split(',') if kind.strip()]
+    unknown = set(kinds) - set(search.KIND_MODELS)
+    if unknown:
+        raise ValueError(f"Unknown kind: {', '.join(sorted(unknown))}.")
+    return kinds
+
+@login_required
+def search_page(request):
+    """Search modules, quiz questions, drill steps and emergency contacts"""
+    query = request.GET.get('q', '').strip()
+    try:
+        kinds = _search_kinds(request.GET.get('kind'))
+    except ValueError:
+        kinds = []
+    results = search.search(query, kinds, SEARCH_PAGE_SIZE) if query else []
+    
+    context = {
+        'query': query,
+        'kind': ','.join(kinds),
+        'results': results,
+    }
+    return render(request, 'search.html', context)
+
+@login_required
+async def search_api(request):
+    """API endpoint with ranked search results; ?q=, optional ?kind=module,question and ?limit="""
+    query = request.GET.get('q', '').strip()
+    try:
+        kinds = _search_kinds(request.GET.get('kind'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    try:
+        limit = min(int(request.GET.get('limit', SEARCH_PAGE_SIZE)), SEARCH_API_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer.'}, status=400)
+    
+    results = await sync_to_async(search.search)(query, kinds, max(limit, 1)) if query else []
+    return JsonResponse({'query': query, 'results': results})
+
 @login_required
+@conditional_page(_contacts_validators, private=True, max_age=300)
 def emergency_contacts(request):
     """Display emergency contacts"""
     contacts = EmergencyContact.objects.filter(is_active=True).order_by('contact_type', 'name')
@@ -313,41 +456,27 @@ def admin_dashboard(request):
         return redirect('dashboard')
     
     # Get statistics
-    total_users = UserProfile.objects.count()
-    student_count = UserProfile.objects.filter(user_type='student').count()
-    teacher_count = UserProfile.objects.filter(user_type='teacher').count()
+    user_counts = get_user_counts()
+    total_users = user_counts['total']
+    student_count = user_counts['student']
+    teacher_count = user_counts['teacher']
     
     # Recent activity
     recent_module_completions = ModuleProgress.objects.filter(
         completed=True
-    ).order_by('-completion_date')[:10]
+    ).select_related('user', 'module__disaster_type').order_by('-completion_date')[:10]
     
-    recent_quiz_attempts = QuizAttempt.objects.order_by('-completed_at')[:10]
+    recent_quiz_attempts = QuizAttempt.objects.select_related(
+        'user', 'quiz__disaster_type'
+    ).order_by('-completed_at')[:10]
     
-    # Progress by disaster type
-    disaster_progress = []
-    for disaster_type in DisasterType.objects.all():
-        modules = disaster_type.modules.all()
-        total_modules = modules.count()
-        
-        completed_count = ModuleProgress.objects.filter(
-            module__disaster_type=disaster_type,
-            completed=True
-        ).count()
-        
-        avg_quiz_score = QuizAttempt.objects.filter(
-            quiz__disaster_type=disaster_type
-        ).aggregate(Avg('score'))['score__avg'] or 0
-        
-        disaster_progress.append({
-            'disaster_type': disaster_type,
-            'completion_rate': (completed_count / (total_modules * student_count * 100)) if total_modules > 0 and student_count > 0 else 0,
-            'avg_quiz_score': avg_quiz_score,
-        })
+    # Progress by disaster type, read from precomputed snapshots
+    disaster_progress = get_disaster_analytics(curriculum.get_disaster_types(), student_count)
     
     context = {
         'total_users': total_users,
         'student_count': student_count,
+        'student_share': (student_count * 100 / total_users) if total_users > 0 else 0,
         'teacher_count': teacher_count,
         'recent_module_completions': recent_module_completions,
         'recent_quiz_attempts': recent_quiz_attempts,
@@ -355,31 +484,186 @@ def admin_dashboard(request):
     }
     return render(request, 'admin_dashboard.html', context)
 
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD).')
+
 @login_required
-def get_progress(request, disaster_id):
-    """API endpoint to get user progress for a specific disaster type"""
-    disaster_type = get_object_or_404(DisasterType, id=disaster_id)
+def export_activity(request, kind):
+    """
+    Stream quiz attempts, drill completions or completed modules as CSV or JSON Lines.
+
+    Filters are ``?institution=``, ``?grade_level=``, ``?since=`` and ``?until=``
+    (inclusive dates); ``?format=jsonl`` switches format and ``?gzip=1``
+    compresses on the fly. Empty filters are ignored. Teachers only ever get
+    their own institution, and none at all until their profile names one.
+    """
+    if kind not in EXPORT_KINDS:
+        raise Http404('Unknown export.')
+    user_profile = getattr(request.user, 'userprofile', None)
+    if not user_profile or user_profile.user_type not in ['teacher', 'admin']:
+        return JsonResponse({'error': 'Teacher or Administrator privileges required.'}, status=403)
     
-    modules = disaster_type.modules.all()
-    completed_modules = ModuleProgress.objects.filter(
-        user=request.user,
-        module__disaster_type=disaster_type,
-        completed=True
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}."}, status=400)
+    try:
+        since = _parse_date(request.GET.get('since'), 'since')
+        until = _parse_date(request.GET.get('until'), 'until')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    institution = request.GET.get('institution') or None
+    if user_profile.user_type == 'teacher':
+        if not user_profile.institution:
+            # Filtering on a blank institution would export every unaffiliated student
+            return JsonResponse({'error': 'Your profile has no institution to export.'}, status=403)
+        institution = user_profile.institution
+    compress = request.GET.get('gzip') in ('1', 'true')
+    
+    rows = export_rows(kind, institution, request.GET.get('grade_level') or None, since, until)
+    chunks = stream_export(kind, rows, fmt, compress)
+    if isinstance(request, ASGIRequest):
+        # A sync iterator would be collected into memory before the first byte is sent
+        chunks = aiter_chunks(chunks)
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='application/gzip' if compress else (
+            'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+        ),
     )
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_filename(kind, fmt, compress)}"'
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+@login_required
+async def get_progress(request, disaster_id):
+    """API endpoint to get user progress for a specific disaster type"""
+    user = await request.auser()
+    disaster_types = await sync_to_async(curriculum.get_disaster_types)()
+    user_progress = await aget_user_progress(user, [disaster_id])
+    disaster_type = next((dt for dt in disaster_types if dt.id == disaster_id), None)
+    if disaster_type is None:
+        raise Http404('Disaster type not found')
+    progress = user_progress[disaster_type.id]
     
-    quiz_attempts = QuizAttempt.objects.filter(
-        user=request.user,
-        quiz__disaster_type=disaster_type
+    data = {
+        'disaster_type': disaster_type.name,
+        'modules_completed': progress['modules_completed'],
+        'total_modules': progress['total_modules'],
+        'completion_rate': progress['completion_rate'],
+        'quiz_attempts': progress['quiz_attempts'],
+        'best_quiz_score': progress['best_quiz_score'],
+        'avg_quiz_score': progress['avg_quiz_score'],
+    }
+    
+    return JsonResponse(data)
+
+def _parse_id_list(value):
+    """Parse a comma-separated id list; None means no filter"""
+    if not value:
+        return None
+    return [int(part) for part in value.split(',') if part.strip()]
+
+@login_required
+async def get_progress_batch(request):
+    """
+    API endpoint with progress for every, or a requested set of, disaster types.
+
+    ``?disaster_types=1,2`` restricts the result and ``?detail=modules,quizzes``
+    adds per-module and per-quiz sections. The ETag is derived from a cheap
+    stamp of the user's rollup rows and the curriculum version, so an
+    unchanged result answers If-None-Match with 304 before any aggregation.
+    """
+    try:
+        requested = _parse_id_list(request.GET.get('disaster_types'))
+    except ValueError:
+        return JsonResponse({'error': 'disaster_types must be a comma-separated list of ids.'}, status=400)
+    detail = {part.strip() for part in request.GET.get('detail', '').split(',') if part.strip()}
+    unknown = detail - set(PROGRESS_DETAILS)
+    if unknown:
+        return JsonResponse({'error': f"Unknown detail: {', '.join(sorted(unknown))}."}, status=400)
+    
+    user = await request.auser()
+    disaster_types = await sync_to_async(curriculum.get_disaster_types)()
+    version = await sync_to_async(curriculum.get_version)()
+    stamp = await aget_progress_stamp(user)
+    if requested is not None:
+        requested = set(requested)
+        disaster_types = [dt for dt in disaster_types if dt.id in requested]
+    
+    fingerprint = (
+        f"{user.pk}:{version}:{stamp['rows']}:{stamp['latest']}:{stamp['events']}:"
+        f"{[dt.id for dt in disaster_types]}:{sorted(detail)}"
     )
+    etag = f'"{hashlib.md5(fingerprint.encode()).hexdigest()}"'
+    
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        user_progress = await aget_user_progress(user, disaster_types)
+        progress_detail = await aget_progress_detail(user, [dt.id for dt in disaster_types], detail)
+        response = JsonResponse({
+            'disaster_types': [
+                {
+                    'id': disaster_type.id,
+                    'name': disaster_type.name,
+                    **user_progress[disaster_type.id],
+                    **progress_detail[disaster_type.id],
+                }
+                for disaster_type in disaster_types
+            ],
+        })
+    response.headers['ETag'] = etag
+    # Browsers may keep the response but must revalidate it every time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@login_required
+async def get_analytics(request):
+    """API endpoint with per-disaster analytics, optionally filtered by institution and grade"""
+    user = await request.auser()
+    user_profile = await UserProfile.objects.filter(user=user).afirst()
+    if not user_profile or user_profile.user_type not in ['teacher', 'admin']:
+        return JsonResponse({'error': 'Teacher or Administrator privileges required.'}, status=403)
+    
+    institution = request.GET.get('institution')
+    grade_level = request.GET.get('grade_level')
+    
+    user_counts, disaster_progress = await aget_analytics(institution, grade_level)
     
     data = {
-        'disaster_type': disaster_type.name,
-        'modules_completed': completed_modules.count(),
-        'total_modules': modules.count(),
-        'completion_rate': (completed_modules.count() / modules.count() * 100) if modules.count() > 0 else 0,
-        'quiz_attempts': quiz_attempts.count(),
-        'best_quiz_score': quiz_attempts.aggregate(models.Max('score'))['score__max'] or 0,
-        'avg_quiz_score': quiz_attempts.aggregate(Avg('score'))['score__avg'] or 0,
+        'institution': institution,
+        'grade_level': grade_level,
+        'user_counts': user_counts,
+        'disaster_types': [
+            {
+                'id': progress['disaster_type'].id,
+                'name': progress['disaster_type'].name,
+                'total_modules': progress['total_modules'],
+                'modules_completed': progress['modules_completed'],
+                'completion_rate': progress['completion_rate'],
+                'quiz_attempts': progress['quiz_attempts'],
+                'avg_quiz_score': progress['avg_quiz_score'],
+                'drill_completions': progress['drill_completions'],
+                'avg_drill_score': progress['avg_drill_score'],
+            }
+            for progress in disaster_progress
+        ],
     }
     
     return JsonResponse(data)
+
+@staff_member_required
+async def curriculum_cache_stats(request):
+    """API endpoint exposing curriculum cache hit/miss counters for this process"""
+    return JsonResponse(curriculum.get_cache_stats())
+
+@staff_member_required
+def request_metrics(request):
+    """Per-view request metrics of this process in the Prometheus text format"""
+    response = HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    patch_cache_control(response, no_store=True)
+    return response
@@ -0,0 +1,167 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class AttemptBuffer:
+    """
+    Write-behind queue for attempt rows.
+
+    Unsaved model instances are collected together with the rollup callback
+    that must run after each insert. The queue is flushed with one
+    ``bulk_create`` per model inside a single transaction once it holds
+    ``max_size`` entries, ``interval`` seconds after the first entry of a
+    batch was queued, or when the process exits. Gunicorn workers also flush
+    from their exit and abort hooks (see gunicorn.conf.py), since a worker
+    killed for timing out never runs ``atexit`` handlers.
+    """
+
+    def __init__(self, max_size=100, interval=2.0):
+        self.max_size = max_size
+        self.interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, instance, callback=None, *args):
+        """Queue an unsaved instance and the callback to run once it is written"""
+        with self._lock:
+            self._pending.append((instance, callback, args))
+            full = len(self._pending) >= self.max_size
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # Timer threads own their DB connection; release it
+            connection.close()
+
+    def flush(self):
+        """Write every queued instance now; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return 0
+
+            try:
+                self._write_batch(pending)
+            except Exception:
+                logger.exception('Batched attempt flush failed; retrying %d rows one by one', len(pending))
+                return self._write_individually(pending)
+            return len(pending)
+
+    def _write_batch(self, pending):
+        by_model = {}
+        for instance, _, _ in pending:
+            by_model.setdefault(type(instance), []).append(instance)
+
+        with transaction.atomic():
+            for model, instances in by_model.items():
+                model.objects.bulk_create(instances)
+            for _, callback, args in pending:
+                if callback is not None:
+                    callback(*args)
+
+    def _write_individually(self, pending):
+        written = 0
+        for instance, callback, args in pending:
+            try:
+                with transaction.atomic():
+                    instance.save(force_insert=True)
+                    if callback is not None:
+                        callback(*args)
+                written += 1
+            except Exception:
+                logger.exception('Dropping attempt %r after failed write', instance)
+        return written
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the process-wide attempt buffer, creating it on first use"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = AttemptBuffer(
+                max_size=getattr(settings, 'ATTEMPT_BUFFER_SIZE', 100),
+                interval=getattr(settings, 'ATTEMPT_BUFFER_INTERVAL', 2.0),
+            )
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def save_attempt(instance, callback=None, *args):
+    """
+    Persist a new attempt row and run its rollup callback.
+
+    With ``ATTEMPT_WRITE_MODE = 'buffered'`` the row is queued for a batched
+    insert; otherwise it is written immediately in its own transaction.
+    """
+    if getattr(settings, 'ATTEMPT_WRITE_MODE', 'sync') == 'buffered':
+        get_buffer().add(instance, callback, *args)
+        return
+
+    with transaction.atomic():
+        instance.save(force_insert=True)
+        if callback is not None:
+            callback(*args)
+
+
+def flush_attempts():
+    """Flush any buffered attempts; safe to call in sync mode"""
+    if _buffer is None:
+        return 0
+    return _buffer.flush()
+
+
+def flush_attempts_in_thread(timeout=10.0):
+    """
+    Flush buffered attempts from a new thread with its own database connection.
+
+    Meant for shutdown and signal hooks, which may interrupt a request that
+    is using this thread's connection or is itself flushing. Waits at most
+    ``timeout`` seconds.
+    """
+    if _buffer is None:
+        return
+
+    def flush():
+        try:
+            _buffer.flush()
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=flush, name='attempt-buffer-flush', daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        logger.error('Gave up flushing %d buffered attempts after %.0fs', len(_buffer), timeout)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+"""
+Production entry point: serve disaster_prep under gunicorn's pre-fork workers.
+
+    python serve.py           # WSGI, sync or threaded workers
+    python serve.py --asgi    # ASGI, uvicorn workers
+
+Worker counts, timeouts and recycling are configured in gunicorn.conf.py.
+Extra arguments are passed through to gunicorn.
+"""
+import os
+import sys
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'disaster_prep.settings')
+    args = sys.argv[1:]
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+    if '--asgi' in args:
+        args.remove('--asgi')
+        app = ['--worker-class', 'uvicorn_worker.UvicornWorker', 'disaster_prep.asgi:application']
+    else:
+        app = ['disaster_prep.wsgi:application']
+
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '--config', config, *args, *app])